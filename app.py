@@ -1,13 +1,33 @@
+"""
+ZeTheta chatbot web application
+
+Each server process loads the embeddings model and FAISS index in a
+background thread of its own, so it serves /healthz right away and
+/readyz reports 503 until the model and index are loaded. Importing this
+module starts no threads and loads no models, which keeps it safe to
+import before forking:
+
+- gunicorn (production): run from the project root, where gunicorn.conf.py
+  starts warmup in each worker as soon as it is initialised. With
+  --preload the master imports the app once and forks workers that have
+  not loaded anything yet, so nothing is shared across the fork.
+      gunicorn --bind 0.0.0.0:5000 --workers 2 --preload main:app
+- Any other server (e.g. python app.py): warmup starts with the first
+  request a process receives.
+"""
+
 import os
 import logging
+import threading
+import time
 from flask import Flask, render_template, request, jsonify, session
 import sqlite3
 from datetime import datetime
 import json
 
-from src.chatbot import get_ai_response
-from src.vector_db import get_relevant_documents
-from src.data_processing import preprocess_query
+# src.chatbot, src.vector_db and src.data_processing pull in langchain, faiss
+# and the embeddings model, so they are imported on first use and warmed up
+# in the background instead of at import time
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, 
@@ -19,13 +39,25 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "default-secret-key-for-dev")
 
 # Database initialization
+_db_initialized = False
+_db_init_lock = threading.Lock()
+
 def get_db_connection():
+    global _db_initialized
+    
+    # Create the tables on first use rather than at import
+    if not _db_initialized:
+        with _db_init_lock:
+            if not _db_initialized:
+                init_db()
+                _db_initialized = True
+    
     conn = sqlite3.connect('chat_history.db')
     conn.row_factory = sqlite3.Row
     return conn
 
 def init_db():
-    conn = get_db_connection()
+    conn = sqlite3.connect('chat_history.db')
     cursor = conn.cursor()
     
     # Create chat sessions table
@@ -53,8 +85,58 @@ def init_db():
     conn.commit()
     conn.close()
 
-# Initialize database
-init_db()
+# Background warmup state, reported by /readyz
+_warmup = {"status": "pending", "model": False, "index": None, "error": None, "seconds": None}
+_warmup_pid = None
+_warmup_lock = threading.Lock()
+
+def warm_up():
+    """Load the embeddings model and FAISS index, then start the index watcher."""
+    start = time.perf_counter()
+    try:
+        from src.vector_db import get_embeddings, get_retriever, start_index_watcher
+        
+        # Load the model and run one forward pass so the first query is fast
+        get_embeddings().embed_query("warmup")
+        _warmup["model"] = True
+        
+        # Load the index if one has been built
+        _warmup["index"] = "loaded" if get_retriever().get_db() is not None else "missing"
+        
+        # Pick up new FAISS index versions without restarting the worker
+        start_index_watcher()
+        
+        # Import the remaining request-path modules
+        import src.chatbot
+        import src.data_processing
+        
+        _warmup["status"] = "ready"
+        logger.info(f"Warmup finished in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        _warmup["status"] = "failed"
+        _warmup["error"] = str(e)
+        logger.error(f"Error during warmup: {str(e)}")
+    finally:
+        _warmup["seconds"] = round(time.perf_counter() - start, 3)
+
+def start_warmup():
+    """Start warmup in a background thread once per process (also after a fork)."""
+    global _warmup_pid
+    
+    if _warmup_pid == os.getpid():
+        return
+    
+    with _warmup_lock:
+        if _warmup_pid == os.getpid():
+            return
+        _warmup_pid = os.getpid()
+        _warmup.update(status="warming", model=False, index=None, error=None, seconds=None)
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+
+@app.before_request
+def ensure_warmup():
+    # Servers without the gunicorn.conf.py hook warm up on the first request
+    start_warmup()
 
 # Routes
 @app.route('/')
@@ -131,6 +213,10 @@ def chat():
         
         conn.commit()
         
+        from src.chatbot import get_ai_response
+        from src.data_processing import preprocess_query
+        from src.vector_db import get_relevant_documents
+        
         # Preprocess query and get relevant documents
         processed_query = preprocess_query(user_message)
         logger.info(f"Processed query: {processed_query}")
@@ -177,6 +263,22 @@ def chat():
         logger.error(f"Error in chat endpoint: {str(e)}")
         return jsonify({"error": "An error occurred processing your request"}), 500
 
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    from src.vector_db import get_cache_stats
+    return jsonify(get_cache_stats())
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness: the process is up and serving requests
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # Readiness: the embeddings model and index have been loaded
+    ready = _warmup["status"] == "ready"
+    return jsonify(dict(_warmup)), 200 if ready else 503
+
 @app.route('/api/chat_history', methods=['GET'])
 def get_chat_history():
     try:
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Chunking Check
+
+Checks that streaming chunking with iter_chunks() produces exactly the
+chunks of splitting the whole text at once with the same chunker, on
+randomized page streams. The streams use small chunk sizes, so each one is
+split in many windows, and include runs of blank lines and whitespace-only
+paragraphs, where a chunk can start at the same offset as the one before it.
+The raw files in data/raw_files are checked as well, when there are any.
+
+Usage:
+    python benchmarks/chunking_check.py
+    python benchmarks/chunking_check.py --runs 10000 --seed 3
+
+Exits with status 1 if any stream is chunked differently.
+"""
+
+import os
+import sys
+import random
+import logging
+import argparse
+
+# Add the project root directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.process_pdfs import (
+    PAGE_SEPARATOR, RAW_FILES_DIR, _make_text_splitter, is_supported_file, iter_chunks, iter_file_pages
+)
+
+# Pieces page texts are made of
+TOKENS = ["word", "ab", "lorem ipsum dolor", "x" * 40, " ", "  ", "\t", "\n", "\n\n", "\n\n\n", "\n \n"]
+
+def random_pages(rng):
+    """Generate a random stream of (page number, text) pairs; some pages are empty."""
+    return [
+        (number, "".join(rng.choice(TOKENS) for _ in range(rng.randint(0, 120))))
+        for number in range(1, rng.randint(1, 60) + 1)
+    ]
+
+def first_difference(pages, chunk_size, chunk_overlap):
+    """
+    Compare streaming and whole-text chunking of a page stream.
+
+    Returns:
+        str: Description of the first difference, or None if they match
+    """
+    pages = list(pages)
+    text = "".join(text + PAGE_SEPARATOR for _, text in pages if text)
+    expected = _make_text_splitter(chunk_size, chunk_overlap).split_text(text)
+    streamed = [chunk for chunk, _, _ in iter_chunks(pages, chunk_size, chunk_overlap)]
+
+    if streamed == expected:
+        return None
+    for i, (a, b) in enumerate(zip(streamed, expected)):
+        if a != b:
+            return f"chunk {i} differs: {b!r} expected, {a!r} streamed"
+    return f"{len(expected)} chunks expected, {len(streamed)} streamed"
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Check that streaming chunking matches whole-text chunking")
+    parser.add_argument("--runs", type=int, default=2000, help="Number of random page streams")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)  # The splitter warns about every oversized chunk
+    rng = random.Random(args.seed)
+    failures = []
+
+    for run in range(args.runs):
+        chunk_size = rng.randint(20, 80)
+        chunk_overlap = rng.randint(0, chunk_size // 2)
+        difference = first_difference(random_pages(rng), chunk_size, chunk_overlap)
+        if difference:
+            failures.append(f"run {run} (size={chunk_size}, overlap={chunk_overlap}): {difference}")
+
+    raw_files = sorted(p for p in RAW_FILES_DIR.glob("*") if is_supported_file(p)) if RAW_FILES_DIR.exists() else []
+    for path in raw_files:
+        for chunk_size, chunk_overlap in [(1000, 200), (200, 50)]:
+            difference = first_difference(iter_file_pages(path), chunk_size, chunk_overlap)
+            if difference:
+                failures.append(f"{path.name} (size={chunk_size}, overlap={chunk_overlap}): {difference}")
+
+    print(f"Checked {args.runs} random page streams and {len(raw_files)} raw files")
+    if failures:
+        print(f"\n{len(failures)} differences:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+
+    print("Streaming chunking matches whole-text chunking.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
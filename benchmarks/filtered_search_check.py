@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Filtered Search Check
+
+Checks that searches restricted to a set of vector ids (source filters)
+return every allowed hit they should, for every FAISS index type. Each type
+is built on synthetic vectors, saved and memory-mapped back as the server
+loads it, and searched with small and large selections, both through the
+exact scoring path and through the FAISS ID selector path.
+
+A search is complete when it returns min(k, selection size) ids, all from
+the selection. Recall against exact search over the selection is reported
+as well; it is only expected to be 1.0 for the exact index types.
+
+Usage:
+    python benchmarks/filtered_search_check.py
+    python benchmarks/filtered_search_check.py --vectors 20000 --json check.json
+
+Exits with status 1 if any search is incomplete.
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+# Add the project root directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import faiss
+import numpy as np
+
+import src.vector_db as vector_db
+from src.vector_db import INDEX_TYPES, Shard, build_faiss_index
+
+from index_precision_report import make_queries, synthetic_vectors
+
+# Selection sizes searched for each index type
+SELECTION_SIZES = (1, 3, 50, 1000)
+
+# Filter paths: (label, FILTER_EXACT_MAX_IDS while searching)
+FILTER_PATHS = [
+    ("exact", vector_db.FILTER_EXACT_MAX_IDS),
+    ("selector", 0),
+]
+
+def check_shard(shard, vectors, ids, queries, k, seed=0):
+    """
+    Run filtered searches on one shard.
+
+    Returns:
+        list: One result dict per (filter path, selection size)
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for size in SELECTION_SIZES:
+        rows = np.sort(rng.choice(len(ids), size, replace=False))
+        allowed = ids[rows]
+
+        # Ground truth: exact search over the selected vectors only
+        exact = faiss.IndexFlatL2(vectors.shape[1])
+        exact.add(vectors[rows])
+        _, truth = exact.search(queries, min(k, size))
+        truth = allowed[truth]
+
+        for label, exact_max in FILTER_PATHS:
+            vector_db.FILTER_EXACT_MAX_IDS = exact_max
+            try:
+                _, hits = shard.search(queries, k, allowed_ids=allowed)
+            finally:
+                vector_db.FILTER_EXACT_MAX_IDS = FILTER_PATHS[0][1]
+
+            expected = min(k, size)
+            allowed_set = set(allowed.tolist())
+            incomplete = 0
+            recall = []
+            for row, true_row in zip(hits, truth):
+                found = [i for i in row.tolist() if i != -1]
+                if len(found) != expected or not set(found) <= allowed_set:
+                    incomplete += 1
+                recall.append(len(set(found) & set(true_row.tolist())) / expected)
+
+            results.append({
+                "path": label,
+                "selection": size,
+                "incomplete_queries": incomplete,
+                "recall": round(float(np.mean(recall)), 4)
+            })
+
+    return results
+
+def run_index_type(index_type, vectors, queries, k, directory):
+    """Build, save and memory-map one index type, then check its filtered searches."""
+    ids = np.arange(len(vectors), dtype=np.int64) * 3 + 1  # Not positions, as after removals
+    index, built_type = build_faiss_index(vectors, index_type, ids)
+
+    path = os.path.join(directory, f"{index_type}.faiss")
+    faiss.write_index(index, path)
+    shard = Shard.load(index_type, path, built_type)
+
+    return {
+        "index_type": index_type,
+        "built_type": built_type,
+        "results": check_shard(shard, vectors, ids, queries, k)
+    }
+
+def print_report(reports):
+    """Print the results as a table."""
+    print(f"{'index type':<12}{'path':<10}{'selection':>10}{'incomplete':>12}{'recall':>9}")
+    for report in reports:
+        label = report["index_type"]
+        if report["built_type"] != label:
+            label += f" ({report['built_type']})"
+        for row in report["results"]:
+            print(f"{label:<12}{row['path']:<10}{row['selection']:>10}"
+                  f"{row['incomplete_queries']:>12}{row['recall']:>9.4f}")
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Check filtered search completeness for every FAISS index type")
+    parser.add_argument("--vectors", type=int, default=6000, help="Number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the vectors")
+    parser.add_argument("--queries", type=int, default=50, help="Number of queries")
+    parser.add_argument("-k", type=int, default=5, help="Number of results per query")
+    parser.add_argument("--index-types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES),
+                        help="Index types to check")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    vectors = synthetic_vectors(args.vectors, args.dim)
+    queries = make_queries(vectors, args.queries)
+
+    with tempfile.TemporaryDirectory(prefix="filtered-search-") as directory:
+        reports = [run_index_type(t, vectors, queries, args.k, directory) for t in args.index_types]
+    print_report(reports)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"vectors": len(vectors), "dimension": args.dim, "k": args.k, "reports": reports}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    failures = [
+        (report["index_type"], row["path"], row["selection"])
+        for report in reports for row in report["results"] if row["incomplete_queries"]
+    ]
+    if failures:
+        print("\nIncomplete filtered searches:")
+        for index_type, path, size in failures:
+            print(f"  {index_type}: {path} path, selection of {size}")
+        return 1
+
+    print("\nAll filtered searches returned complete results.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
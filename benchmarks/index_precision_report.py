@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Vector Precision Report
+
+Compares the memory, query latency and recall of reduced-precision index
+types (float16 / int8 scalar quantization, with and without exact
+re-ranking) against the exact float32 flat index.
+
+Vectors are read back from the current FAISS index, or generated when
+--synthetic is given. Queries are perturbed copies of corpus vectors and
+recall@k is measured against exact flat search.
+
+Usage:
+    python benchmarks/index_precision_report.py
+    python benchmarks/index_precision_report.py --synthetic 100000 --json report.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# Add the project root directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import faiss
+import numpy as np
+
+from src.vector_db import RERANK_FACTOR, Shard, build_faiss_index, load_faiss_index
+
+# Index configurations compared against "flat": (label, index type, re-rank)
+CONFIGS = [
+    ("flat", "flat", False),
+    ("sq_fp16", "sq_fp16", False),
+    ("sq_int8", "sq_int8", False),
+    ("sq_fp16+rerank", "sq_fp16", True),
+    ("sq_int8+rerank", "sq_int8", True),
+]
+
+def load_index_vectors():
+    """Read every vector back from the current index."""
+    db = load_faiss_index()
+    if db is None:
+        raise SystemExit("No index found; build one first or pass --synthetic N")
+
+    try:
+        parts = []
+        for shard in db.shards:
+            ids = shard.ids()
+            if ids is None or not isinstance(shard.index, faiss.IndexIDMap2):
+                raise SystemExit(f"Cannot read vectors back from {shard.index_type} shards; use --synthetic N")
+            parts.append(shard.index.reconstruct_batch(ids))
+        return np.vstack(parts).astype(np.float32)
+    finally:
+        db.close()
+
+def synthetic_vectors(n, dim, seed=0):
+    """Generate clustered, unit-length vectors resembling sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 100), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_queries(vectors, n_queries, seed=1):
+    """Perturb a random sample of corpus vectors to use as queries."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)]
+    noise = rng.normal(scale=0.05, size=sample.shape).astype(np.float32)
+    return np.ascontiguousarray(sample + noise, dtype=np.float32)
+
+def run_config(label, index_type, rerank, vectors, queries, k, truth):
+    """Build one index configuration and measure it."""
+    ids = np.arange(len(vectors), dtype=np.int64)
+
+    start = time.perf_counter()
+    index, _ = build_faiss_index(vectors, index_type, ids)
+    build_seconds = time.perf_counter() - start
+    shard = Shard(label, index, index_type, vectors=vectors if rerank else None)
+
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, hits = shard.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(hits[0])
+
+    recall = np.mean([
+        len(set(hits.tolist()) & set(expected.tolist())) / k
+        for hits, expected in zip(found, truth)
+    ])
+
+    return {
+        "config": label,
+        "index_bytes": len(faiss.serialize_index(index)),
+        "rerank_bytes": vectors.nbytes if rerank else 0,
+        "build_seconds": round(build_seconds, 3),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+        f"recall@{k}": round(float(recall), 4)
+    }
+
+def print_report(results, k):
+    """Print the results as a table."""
+    print(f"{'config':<16}{'index MB':>10}{'rerank MB':>11}{'p50 ms':>9}{'p95 ms':>9}{f'recall@{k}':>11}")
+    for row in results:
+        print(
+            f"{row['config']:<16}"
+            f"{row['index_bytes'] / 1e6:>10.1f}"
+            f"{row['rerank_bytes'] / 1e6:>11.1f}"
+            f"{row['latency_ms_p50']:>9.3f}"
+            f"{row['latency_ms_p95']:>9.3f}"
+            f"{row[f'recall@{k}']:>11.4f}"
+        )
+    print(f"\nRe-ranked configs fetch {RERANK_FACTOR}x k candidates; their float32 vectors are memory-mapped from disk.")
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Compare reduced-precision index types with the flat index")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N generated vectors instead of the current index")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("-k", type=int, default=5, help="Number of results per query")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    vectors = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else load_index_vectors()
+    queries = make_queries(vectors, args.queries)
+    print(f"Comparing index types on {len(vectors)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries\n")
+
+    # Ground truth from exact float32 search
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    results = [
+        run_config(label, index_type, rerank, vectors, queries, args.k, truth)
+        for label, index_type, rerank in CONFIGS
+    ]
+    print_report(results, args.k)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"vectors": len(vectors), "dimension": int(vectors.shape[1]), "k": args.k,
+                       "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Ingestion Benchmark
+
+Measures how document ingestion scales with document size. Synthetic PDF
+and Word documents of the requested page counts are generated, then each
+one goes through the ingestion steps in turn:
+
+    extract  extract_text_from_pdf() (Word: the .docx extractor)
+    chunk    split_text_into_chunks()
+    embed    embed_texts() with the configured embeddings backend
+    index    create_faiss_index(), reusing the vectors cached by the embed step
+
+and pages/sec, chunks/sec, vectors/sec, peak RSS and index size are
+reported. Everything is written to a temporary working directory, so the
+project's index and embedding cache are left alone.
+
+A run can be compared against a stored baseline (the JSON written by an
+earlier run); throughput that drops, or memory and index size that grow,
+by more than --tolerance are reported as regressions and the exit code is 1.
+
+Set EMBEDDINGS_BACKEND=mock to measure ingestion without loading a model.
+
+Usage:
+    python benchmarks/ingest_benchmark.py --pages 50 200 --json baseline.json
+    python benchmarks/ingest_benchmark.py --pages 50 200 --json run.json --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import zipfile
+import argparse
+import tempfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+# Add the project root directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.embeddings import EMBEDDINGS_BACKEND, EMBEDDINGS_MODEL, EMBEDDINGS_WORKERS, embed_texts
+from src.process_pdfs import PAGE_SEPARATOR, extract_text_from_pdf, iter_file_pages, split_text_into_chunks
+from src.vector_db import (
+    FAISS_INDEX_PATH, FAISS_INDEX_TYPE, create_faiss_index, get_current_index_version, get_index_version_path
+)
+
+FORMATS = ("pdf", "docx")
+
+# Metrics compared against a baseline, by whether higher values are better
+HIGHER_IS_BETTER = ("pages_per_sec", "chunks_per_sec", "vectors_per_sec")
+LOWER_IS_BETTER = ("peak_rss_mb", "index_bytes")
+
+# Synthetic text layout
+LINE_WORDS = 12
+
+def synthetic_pages(n_pages, words_per_page, seed):
+    """
+    Generate pages of paragraphs made of pseudo-words.
+
+    Returns:
+        list: One list of paragraphs (strings) per page
+    """
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+
+    pages = []
+    for _ in range(n_pages):
+        paragraphs = []
+        remaining = words_per_page
+        while remaining > 0:
+            n_words = min(remaining, rng.randint(40, 120))
+            words = rng.choices(vocabulary, k=n_words)
+            paragraphs.append(" ".join(words).capitalize() + ".")
+            remaining -= n_words
+        pages.append(paragraphs)
+    return pages
+
+def write_pdf(path, pages):
+    """Write pages as a minimal PDF with one text object per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    page_refs = []
+
+    for paragraphs in pages:
+        lines = []
+        for paragraph in paragraphs:
+            words = paragraph.split()
+            lines.extend(" ".join(words[i:i + LINE_WORDS]) for i in range(0, len(words), LINE_WORDS))
+            lines.append("")
+
+        text = " T* ".join(f"({line})Tj" if line else "" for line in lines)
+        stream = f"BT /F1 9 Tf 12 TL 40 800 Td {text} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+def write_docx(path, pages):
+    """Write pages as a minimal Word document, with a page break after each page."""
+    body = []
+    for paragraphs in pages:
+        for paragraph in paragraphs:
+            body.append(f"<w:p><w:r><w:t>{escape(paragraph)}</w:t></w:r></w:p>")
+        body.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        docx.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'
+        ))
+        docx.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{"".join(body)}</w:body></w:document>'
+        ))
+
+def reset_peak_rss():
+    """Reset the process's peak RSS so the next reading covers one corpus (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass  # Peak RSS then covers the whole run so far
+
+def peak_rss_mb():
+    """Return the process's peak resident set size in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def directory_bytes(path):
+    """Return the total size of the files under path."""
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+def extract_text(path):
+    """Extract a synthetic document's text the way ingestion does."""
+    if path.suffix == ".pdf":
+        return extract_text_from_pdf(path)
+    return "".join(text + PAGE_SEPARATOR for _, text in iter_file_pages(path) if text)
+
+def rate(count, seconds):
+    """Return count per second, rounded for the report."""
+    return round(count / seconds, 1) if seconds else None
+
+def run_corpus(fmt, n_pages, words_per_page, seed, work_dir):
+    """Generate one synthetic document and measure every ingestion step on it."""
+    name = f"{fmt}-{n_pages}p"
+    path = Path(work_dir) / f"synthetic-{name}.{fmt}"
+    pages = synthetic_pages(n_pages, words_per_page, seed)
+    (write_pdf if fmt == "pdf" else write_docx)(path, pages)
+    del pages
+
+    shutil.rmtree(FAISS_INDEX_PATH, ignore_errors=True)
+    reset_peak_rss()
+
+    start = time.perf_counter()
+    text = extract_text(path)
+    extract_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = split_text_into_chunks(text, path.name)
+    chunk_seconds = time.perf_counter() - start
+    n_characters = len(text)
+    del text
+
+    texts = [chunk["text"] for chunk in chunks]
+    start = time.perf_counter()
+    embed_texts(texts)
+    embed_seconds = time.perf_counter() - start
+
+    from langchain.schema.document import Document
+    documents = [Document(page_content=chunk["text"], metadata=chunk["metadata"]) for chunk in chunks]
+    start = time.perf_counter()
+    create_faiss_index(documents, FAISS_INDEX_TYPE).close()
+    index_seconds = time.perf_counter() - start
+
+    return {
+        "corpus": name,
+        "format": fmt,
+        "pages": n_pages,
+        "file_bytes": path.stat().st_size,
+        "characters": n_characters,
+        "chunks": len(chunks),
+        "extract_seconds": round(extract_seconds, 3),
+        "pages_per_sec": rate(n_pages, extract_seconds),
+        "chunk_seconds": round(chunk_seconds, 3),
+        "chunks_per_sec": rate(len(chunks), chunk_seconds),
+        "embed_seconds": round(embed_seconds, 3),
+        "vectors_per_sec": rate(len(texts), embed_seconds),
+        "index_seconds": round(index_seconds, 3),
+        "index_bytes": directory_bytes(get_index_version_path(get_current_index_version())),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline run.
+
+    Returns:
+        list: (corpus, metric, baseline value, current value, change) for each regression
+    """
+    baseline_by_corpus = {row["corpus"]: row for row in baseline.get("results", [])}
+    regressions = []
+
+    print(f"\n{'corpus':<12}{'metric':<18}{'baseline':>12}{'current':>12}{'change':>9}")
+    for row in results:
+        old = baseline_by_corpus.get(row["corpus"])
+        if old is None:
+            print(f"{row['corpus']:<12}(not in baseline)")
+            continue
+
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if not old.get(metric) or row.get(metric) is None:
+                continue
+            change = row[metric] / old[metric] - 1
+            worse = change < -tolerance if metric in HIGHER_IS_BETTER else change > tolerance
+            flag = "  REGRESSION" if worse else ""
+            print(f"{row['corpus']:<12}{metric:<18}{old[metric]:>12}{row[metric]:>12}{change:>+9.1%}{flag}")
+            if worse:
+                regressions.append((row["corpus"], metric, old[metric], row[metric], change))
+
+    return regressions
+
+def print_report(results):
+    """Print the results as a table."""
+    print(f"{'corpus':<12}{'chunks':>8}{'pages/s':>10}{'chunks/s':>11}{'vectors/s':>11}"
+          f"{'index s':>9}{'index MB':>10}{'peak MB':>9}")
+    for row in results:
+        print(
+            f"{row['corpus']:<12}"
+            f"{row['chunks']:>8}"
+            f"{row['pages_per_sec']:>10}"
+            f"{row['chunks_per_sec']:>11}"
+            f"{row['vectors_per_sec']:>11}"
+            f"{row['index_seconds']:>9.2f}"
+            f"{row['index_bytes'] / 1e6:>10.1f}"
+            f"{row['peak_rss_mb']:>9.1f}"
+        )
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Measure ingestion throughput on synthetic documents")
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100], help="Page counts of the documents")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS), help="Document formats")
+    parser.add_argument("--words-per-page", type=int, default=400, help="Words on each synthetic page")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic text")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with the results of an earlier run (JSON)")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative change beyond which a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    output_path = os.path.abspath(args.json) if args.json else None
+    project_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="ingest-benchmark-")
+
+    print(f"Embeddings: {EMBEDDINGS_MODEL} ({EMBEDDINGS_BACKEND}, {EMBEDDINGS_WORKERS} workers); "
+          f"index type: {FAISS_INDEX_TYPE}\n")
+
+    # The index and embedding cache paths are relative, so they land in work_dir
+    os.chdir(work_dir)
+    try:
+        results = [
+            run_corpus(fmt, n_pages, args.words_per_page, args.seed + i, work_dir)
+            for i, (fmt, n_pages) in enumerate((fmt, n) for fmt in args.formats for n in args.pages)
+        ]
+    finally:
+        os.chdir(project_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(results)
+
+    report = {
+        "embeddings_model": EMBEDDINGS_MODEL,
+        "embeddings_backend": EMBEDDINGS_BACKEND,
+        "embeddings_workers": EMBEDDINGS_WORKERS,
+        "index_type": FAISS_INDEX_TYPE,
+        "words_per_page": args.words_per_page,
+        "results": results
+    }
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output_path}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
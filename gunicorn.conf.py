@@ -0,0 +1,10 @@
+"""
+Gunicorn settings
+
+Loaded automatically when gunicorn is started from the project root.
+"""
+
+def post_worker_init(worker):
+    """Start loading the model and index in each worker before its first request."""
+    from app import start_warmup
+    start_warmup()
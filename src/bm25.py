@@ -0,0 +1,98 @@
+"""
+BM25 lexical scoring
+
+Tokenization and Okapi BM25 scoring used by the inverted index that the
+docstore builds alongside the FAISS vectors. Exact-term questions (names,
+figures, codes) are matched here without a transformer forward pass.
+"""
+
+import re
+import math
+from collections import Counter
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Typical chunk length in terms, used to order postings by impact
+IMPACT_REFERENCE_LENGTH = 100
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Common English words that carry no retrieval signal
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no
+nor not now of off on once only or other our ours ourselves out over own same
+she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when
+where which while who whom why will with would you your yours yourself
+yourselves
+""".split())
+
+def tokenize(text):
+    """
+    Split text into lowercase index terms, dropping stopwords.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: Terms in order of appearance
+    """
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+def term_frequencies(text):
+    """
+    Count the index terms in a chunk.
+
+    Args:
+        text (str): Chunk text
+
+    Returns:
+        tuple: (Counter of term frequencies, document length in terms)
+    """
+    terms = tokenize(text)
+    return Counter(terms), len(terms)
+
+def idf(n_docs, df):
+    """Return the BM25 inverse document frequency of a term."""
+    return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+def posting_impact(tf, length):
+    """
+    Return a posting's BM25 term weight at IMPACT_REFERENCE_LENGTH, without IDF.
+
+    The docstore stores this with each posting and reads a term's postings
+    in descending impact order, so the best matches for the term come first
+    and the rest can be cut off. Scores themselves use the collection's
+    actual average length.
+
+    Args:
+        tf (int): Term frequency in the chunk
+        length (int): Chunk length in terms
+
+    Returns:
+        float: Impact
+    """
+    return tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / IMPACT_REFERENCE_LENGTH))
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    """
+    Merge several ranked id lists with reciprocal rank fusion.
+
+    Args:
+        ranked_lists (list): Lists of ids, best first
+        k (int): RRF damping constant
+
+    Returns:
+        list: Ids sorted by fused score, best first
+    """
+    scores = {}
+    for ranked in ranked_lists:
+        for rank, doc_id in enumerate(ranked):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+
+    return sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
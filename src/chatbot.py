@@ -1,12 +1,19 @@
 import os
+import sys
 import logging
+
+# Add the project root directory to the Python path when run directly
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 from langchain_openai import ChatOpenAI
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from dotenv import load_dotenv
 
+from src.embeddings import MockEmbeddings, get_embeddings as get_shared_embeddings
+
 # Load environment variables
 load_dotenv()
 
@@ -65,22 +72,14 @@ class MockLLM:
 # ----------------------- EMBEDDINGS -----------------------
 
 def get_embeddings():
-    """Return embeddings model."""
+    """Return the shared embeddings model, or MockEmbeddings if it fails to load."""
     try:
-        return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        return get_shared_embeddings()
     except Exception as e:
         logger.error(f"Embeddings error: {e}")
         return MockEmbeddings()
 
 
-class MockEmbeddings:
-    """Mock embedding model."""
-    def embed_documents(self, texts):
-        return [[0.0] * 384 for _ in texts]
-    def embed_query(self, text):
-        return [0.0] * 384
-
-
 # ----------------------- AI RESPONSE -----------------------
 
 def get_ai_response(user_query, relevant_documents=None):
@@ -0,0 +1,200 @@
+"""
+Text chunker
+
+Splits text the way LangChain's RecursiveCharacterTextSplitter does with
+this project's settings (keep_separator, strip_whitespace, literal
+separators), producing the same chunks, but in a single pass over (start,
+end) offsets into the original text instead of splitting, re-joining and
+stripping copies of it at every level. Since the offsets are exact, chunks
+can be mapped back to their position (and so their pages) without
+searching for them.
+
+Chunk sizes are measured in characters, or in tokens of a tiktoken
+encoding when CHUNK_TOKEN_ENCODING is set (e.g. cl100k_base).
+"""
+
+import os
+import copy
+import logging
+from collections import deque
+
+from langchain_core.documents import Document
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Chunker settings
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+CHUNK_TOKEN_ENCODING = os.getenv("CHUNK_TOKEN_ENCODING") or None  # Measure chunks in tokens of this encoding
+
+class TextChunker:
+    """
+    Recursive character splitter working on offsets.
+
+    Text is split at the first separator that occurs in it, with each
+    separator kept at the start of the piece that follows it. Pieces
+    shorter than chunk_size are merged into chunks of up to chunk_size,
+    consecutive chunks overlapping by up to chunk_overlap; longer pieces are
+    split again at the next separator. Chunks are stripped of surrounding
+    whitespace.
+    """
+
+    def __init__(self, chunk_size=1000, chunk_overlap=200, separators=DEFAULT_SEPARATORS, length_function=None):
+        """
+        Args:
+            chunk_size (int): Largest chunk length
+            chunk_overlap (int): Largest overlap between consecutive chunks
+            separators (sequence): Separators to split at, in order of preference;
+                                   "" splits between characters
+            length_function (callable): Length of a string; defaults to len
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) is larger than chunk size ({chunk_size})")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+        self._length_function = length_function
+
+    @classmethod
+    def from_tiktoken_encoding(cls, encoding_name, **kwargs):
+        """Create a chunker that measures chunks in tokens of a tiktoken encoding."""
+        # Optional dependency, only needed for token-sized chunks
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(encoding_name)
+        return cls(length_function=lambda text: len(encoding.encode(text, disallowed_special=())), **kwargs)
+
+    def _length(self, text, start, end):
+        if self._length_function is None:
+            return end - start
+        return self._length_function(text[start:end])
+
+    def split_spans(self, text):
+        """
+        Split text into chunks.
+
+        Returns:
+            list: (start, end) offsets of each chunk in text
+        """
+        spans = []
+        self._split(text, 0, len(text), 0, spans)
+        return spans
+
+    def split_text(self, text):
+        """
+        Split text into chunks.
+
+        Returns:
+            list: Chunk strings
+        """
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_documents(self, documents):
+        """
+        Split documents into chunk documents, each with a copy of its document's metadata.
+
+        Returns:
+            list: Chunk documents
+        """
+        return [
+            Document(page_content=chunk, metadata=copy.deepcopy(doc.metadata))
+            for doc in documents
+            for chunk in self.split_text(doc.page_content)
+        ]
+
+    def _split(self, text, start, end, level, spans):
+        """Split text[start:end] using the separators from level on, appending chunk spans."""
+        # Use the first separator that occurs in the text
+        separators = self.separators
+        separator = separators[-1]
+        next_level = len(separators)
+        for i in range(level, len(separators)):
+            if separators[i] == "":
+                separator = ""
+                break
+            if text.find(separators[i], start, end) >= 0:
+                separator = separators[i]
+                next_level = i + 1
+                break
+
+        good = []  # (start, end, length) of consecutive pieces short enough to merge
+        for piece_start, piece_end in self._pieces(text, start, end, separator):
+            length = self._length(text, piece_start, piece_end)
+            if length < self.chunk_size:
+                good.append((piece_start, piece_end, length))
+                continue
+
+            if good:
+                self._merge(text, good, spans)
+                good = []
+            if next_level < len(separators):
+                self._split(text, piece_start, piece_end, next_level, spans)
+            else:
+                spans.append((piece_start, piece_end))  # Nothing left to split at; kept as is
+        if good:
+            self._merge(text, good, spans)
+
+    @staticmethod
+    def _pieces(text, start, end, separator):
+        """Yield the non-empty pieces of text[start:end], each starting with the separator before it."""
+        if separator == "":
+            for i in range(start, end):
+                yield i, i + 1
+            return
+
+        previous = start
+        position = text.find(separator, start, end)
+        while position >= 0:
+            if position > previous:
+                yield previous, position
+            previous = position
+            position = text.find(separator, position + len(separator), end)
+        if end > previous:
+            yield previous, end
+
+    def _merge(self, text, pieces, spans):
+        """Merge consecutive pieces into overlapping chunks of up to chunk_size."""
+        current = deque()
+        total = 0
+        for piece in pieces:
+            length = piece[2]
+            if total + length > self.chunk_size and current:
+                if total > self.chunk_size:
+                    logger.warning(f"Created a chunk of size {total}, which is longer than the specified {self.chunk_size}")
+                self._emit(text, current[0][0], current[-1][1], spans)
+
+                # Keep the tail of the chunk as the start of the next one
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= current.popleft()[2]
+
+            current.append(piece)
+            total += length
+
+        if current:
+            self._emit(text, current[0][0], current[-1][1], spans)
+
+    @staticmethod
+    def _emit(text, start, end, spans):
+        """Append the span of text[start:end] with surrounding whitespace stripped, unless it is empty."""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            spans.append((start, end))
+
+def create_chunker(chunk_size=1000, chunk_overlap=200, separators=DEFAULT_SEPARATORS):
+    """
+    Create the chunker for the configured length unit.
+
+    Returns:
+        TextChunker: Measuring characters, or tokens of CHUNK_TOKEN_ENCODING when set
+    """
+    if CHUNK_TOKEN_ENCODING:
+        return TextChunker.from_tiktoken_encoding(
+            CHUNK_TOKEN_ENCODING, chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators
+        )
+    return TextChunker(chunk_size, chunk_overlap, separators)
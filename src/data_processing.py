@@ -1,9 +1,10 @@
 import os
 import logging
 import re
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader, PyPDFLoader, Docx2txtLoader, CSVLoader
 
+from src.chunker import create_chunker
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -52,11 +53,7 @@ def load_and_split_documents(file_paths):
         documents = []
         
         # Create text splitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len
-        )
+        text_splitter = create_chunker(CHUNK_SIZE, CHUNK_OVERLAP)
         
         # Process each file
         for file_path in file_paths:
@@ -0,0 +1,534 @@
+"""
+On-disk document store for indexed chunks
+
+Chunk text and metadata are kept in a SQLite database keyed by FAISS vector
+id. Serving processes open it read-only and fetch rows only for the top-k
+search hits, instead of unpickling every chunk into memory.
+"""
+
+import os
+import json
+import hashlib
+import shutil
+import sqlite3
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from langchain.schema.document import Document
+
+from collections import Counter
+
+from src.bm25 import B, IMPACT_REFERENCE_LENGTH, K1, idf, posting_impact, term_frequencies, tokenize
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DOCSTORE_FILENAME = "docstore.sqlite"
+
+# Maximum number of SQL variables per IN (...) query
+SQL_BATCH_SIZE = 500
+
+# Terms that occur in more than this fraction of chunks are ignored by BM25
+MAX_TERM_DOC_FRACTION = 0.5
+
+# Most postings scored per query term, highest impact first
+BM25_MAX_POSTINGS = int(os.getenv("BM25_MAX_POSTINGS", "1000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    chunk_hash TEXT,
+    length INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    impact REAL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+HASH_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_chunks_hash ON chunks (chunk_hash)"
+
+# Postings are read by term in impact order, and by chunk and term to score candidates
+POSTINGS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_postings_impact ON postings (term, impact DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_postings_id_term ON postings (id, term)"
+)
+
+def compute_chunk_hash(document):
+    """
+    Return a stable content hash for a chunk.
+
+    The hash covers the source file, the chunk number and the chunk text, so
+    re-processing an unchanged file yields the same hashes.
+
+    Args:
+        document (Document): Document chunk
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    source = str(document.metadata.get('source', ''))
+    chunk = str(document.metadata.get('chunk', ''))
+    payload = "\x00".join((source, chunk, document.page_content))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class SQLiteDocstore:
+    """
+    Chunk text and metadata stored in SQLite, keyed by FAISS vector id.
+
+    Writes go through a single connection guarded by a lock. Read-only
+    stores run searches and lookups on pooled connections of their own, so
+    concurrent queries do not wait on each other.
+    """
+
+    def __init__(self, path, read_only=False):
+        """
+        Open (or create) a docstore.
+
+        Args:
+            path (str): Path to the SQLite file
+            read_only (bool): Open without write access, for serving processes
+        """
+        self.path = str(path)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._is_scratch = False
+        self._idle_readers = []
+        self._closed = False
+
+        # Collection statistics for BM25; constant for read-only stores
+        self._lexical_stats = None
+
+        if read_only:
+            self._conn = self._connect_read_only()
+            # Docstores written before term statistics were stored need re-ingesting for BM25
+            self.has_lexical_index = self._conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name = 'idx_postings_impact'"
+            ).fetchone()[0] > 0
+            if not self.has_lexical_index:
+                logger.warning(f"Docstore {self.path} has no BM25 term statistics; "
+                               "keyword search is disabled until the index is rebuilt")
+        else:
+            self.has_lexical_index = True
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+            self._conn.commit()
+
+    def _connect_read_only(self):
+        """Open a read-only connection to the docstore."""
+        uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    @contextmanager
+    def _reader(self):
+        """
+        Yield a connection for read queries.
+
+        Read-only stores hand each concurrent reader its own connection,
+        reused from an idle pool, so searches do not wait on each other;
+        writable stores share the locked main connection.
+        """
+        if not self.read_only:
+            with self._lock:
+                yield self._conn
+            return
+
+        with self._lock:
+            conn = self._idle_readers.pop() if self._idle_readers else None
+        if conn is None:
+            conn = self._connect_read_only()
+
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle_readers.append(conn)
+
+    def _migrate(self):
+        """Bring a docstore written by an older version up to the current schema."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        posting_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(postings)")}
+
+        if "chunk_hash" not in columns:
+            logger.info(f"Adding chunk hashes to docstore {self.path}")
+            self._conn.execute("ALTER TABLE chunks ADD COLUMN chunk_hash TEXT")
+
+        if "length" not in columns:
+            logger.info(f"Building inverted index for docstore {self.path}")
+            self._conn.execute("ALTER TABLE chunks ADD COLUMN length INTEGER")
+
+        if "impact" not in posting_columns:
+            logger.info(f"Adding posting impacts and term statistics to docstore {self.path}")
+            self._conn.execute("ALTER TABLE postings ADD COLUMN impact REAL")
+            self._conn.execute(
+                "UPDATE postings SET impact = tf * ? / (tf + ? * (1 - ? + ? * "
+                "COALESCE((SELECT length FROM chunks WHERE chunks.id = postings.id), 0) / ?))",
+                (K1 + 1, K1, B, B, float(IMPACT_REFERENCE_LENGTH))
+            )
+            self._conn.execute("DELETE FROM terms")
+            self._conn.execute("INSERT INTO terms (term, df) SELECT term, COUNT(*) FROM postings GROUP BY term")
+            # Covered by the new indexes
+            self._conn.execute("DROP INDEX IF EXISTS idx_postings_term")
+            self._conn.execute("DROP INDEX IF EXISTS idx_postings_id")
+
+        # Backfill postings for rows stored before the inverted index existed
+        rows = self._conn.execute(
+            "SELECT id, text FROM chunks WHERE length IS NULL"
+        ).fetchall()
+        self._insert_terms(rows)
+
+        # Backfill hashes for rows stored before hashing existed
+        rows = self._conn.execute(
+            "SELECT id, text, metadata FROM chunks WHERE chunk_hash IS NULL"
+        ).fetchall()
+        if rows:
+            self._conn.executemany(
+                "UPDATE chunks SET chunk_hash = ? WHERE id = ?",
+                [
+                    (compute_chunk_hash(Document(page_content=row[1], metadata=json.loads(row[2]))), row[0])
+                    for row in rows
+                ]
+            )
+
+        self._conn.execute(HASH_INDEX)
+        for statement in POSTINGS_INDEXES:
+            self._conn.execute(statement)
+
+    @classmethod
+    def scratch(cls, source_path=None):
+        """
+        Create a writable docstore in a temporary file.
+
+        Writers build or modify a scratch copy and then save() it into a new
+        index version, leaving the published version untouched.
+
+        Args:
+            source_path (str): Existing docstore to copy, if any
+
+        Returns:
+            SQLiteDocstore: Writable docstore that deletes its file on close()
+        """
+        fd, path = tempfile.mkstemp(prefix="docstore-", suffix=".sqlite")
+        os.close(fd)
+
+        if source_path is not None:
+            shutil.copyfile(source_path, path)
+
+        docstore = cls(path)
+        docstore._is_scratch = True
+
+        # The copy is discarded if the writer crashes, so commits (one per
+        # batch when ingesting) need not wait for the disk
+        docstore._conn.execute("PRAGMA synchronous = OFF")
+        return docstore
+
+    def add(self, ids, documents, hashes=None):
+        """
+        Store documents under the given vector ids.
+
+        Args:
+            ids (list): Integer vector ids, one per document
+            documents (list): LangChain Document objects
+            hashes (list): Precomputed chunk hashes, if already known
+
+        Raises:
+            sqlite3.IntegrityError: If an id or chunk hash is already stored;
+                                    nothing is added then
+        """
+        if hashes is None:
+            hashes = [compute_chunk_hash(doc) for doc in documents]
+
+        rows = [
+            (
+                int(doc_id),
+                doc.metadata.get('source'),
+                doc.page_content,
+                json.dumps(doc.metadata, ensure_ascii=False),
+                chunk_hash
+            )
+            for doc_id, doc, chunk_hash in zip(ids, documents, hashes)
+        ]
+
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT INTO chunks (id, source, text, metadata, chunk_hash) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._insert_terms([(row[0], row[2]) for row in rows])
+            except sqlite3.Error:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _insert_terms(self, rows):
+        """Add chunks' terms to the inverted index and record their lengths."""
+        postings = []
+        lengths = []
+        df = Counter()
+        for doc_id, text in rows:
+            frequencies, length = term_frequencies(text)
+            postings.extend((term, doc_id, tf, posting_impact(tf, length)) for term, tf in frequencies.items())
+            lengths.append((length, doc_id))
+            df.update(frequencies.keys())
+
+        self._conn.executemany("INSERT INTO postings (term, id, tf, impact) VALUES (?, ?, ?, ?)", postings)
+        self._conn.executemany("UPDATE chunks SET length = ? WHERE id = ?", lengths)
+        self._conn.executemany(
+            "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            df.items()
+        )
+
+    def _delete_postings(self, ids):
+        """Remove the inverted index entries for the given ids."""
+        df = Counter()
+        for start in range(0, len(ids), SQL_BATCH_SIZE):
+            batch = ids[start:start + SQL_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            df.update(dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE id IN ({placeholders}) GROUP BY term", batch
+            )))
+            self._conn.execute(f"DELETE FROM postings WHERE id IN ({placeholders})", batch)
+
+        self._conn.executemany("UPDATE terms SET df = df - ? WHERE term = ?", [(n, t) for t, n in df.items()])
+        self._conn.executemany("DELETE FROM terms WHERE term = ? AND df <= 0", [(t,) for t in df])
+
+    def _get_lexical_stats(self, conn):
+        """Return (number of chunks, average chunk length in terms)."""
+        if self._lexical_stats is not None:
+            return self._lexical_stats
+
+        n_docs, avg_length = conn.execute(
+            "SELECT COUNT(*), AVG(length) FROM chunks"
+        ).fetchone()
+        stats = (n_docs, avg_length or 0.0)
+
+        if self.read_only:
+            self._lexical_stats = stats
+        return stats
+
+    def bm25_search(self, query, limit=20, sources=None):
+        """
+        Rank chunks against a query with BM25 over the inverted index.
+
+        Candidates are the top BM25_MAX_POSTINGS postings of each query term
+        by impact, or every chunk of the given sources, so the cost of a
+        query is bounded however common its terms are. Candidates are then
+        scored on all query terms and ranked in SQL, with document
+        frequencies read from the terms table.
+
+        Args:
+            query (str): The user's question or message
+            limit (int): Maximum number of hits to return
+            sources (list): Only rank chunks from these source files
+
+        Returns:
+            list: (vector id, score, coverage) tuples, best first; coverage is
+                  the IDF-weighted fraction of query terms the chunk contains
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.has_lexical_index:
+            return []
+
+        with self._reader() as conn:
+            n_docs, avg_length = self._get_lexical_stats(conn)
+            if n_docs == 0:
+                return []
+
+            placeholders = ",".join("?" * len(terms))
+            dfs = dict(conn.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", terms))
+
+            weights = {}
+            for term in terms:
+                df = dfs.get(term, 0)
+
+                # Very common terms carry little signal but cost a lot to score
+                if df > MAX_TERM_DOC_FRACTION * n_docs and n_docs > 1:
+                    continue
+                weights[term] = idf(n_docs, df)
+
+            total_idf = sum(weights.values())
+            matched = [term for term in weights if dfs.get(term)]
+            if not matched:
+                return []
+
+            if sources is None:
+                candidates = " UNION ".join(
+                    ["SELECT id FROM (SELECT id FROM postings WHERE term = ? ORDER BY impact DESC LIMIT ?)"] * len(matched)
+                )
+                candidate_params = [value for term in matched for value in (term, BM25_MAX_POSTINGS)]
+            else:
+                candidates = f"SELECT id FROM chunks WHERE source IN ({','.join('?' * len(sources))})"
+                candidate_params = list(sources)
+
+            rows = conn.execute(
+                f"WITH weights (term, idf) AS (VALUES {','.join(['(?, ?)'] * len(matched))}), "
+                f"candidates (id) AS ({candidates}) "
+                "SELECT p.id, SUM(w.idf * p.tf * ? / (p.tf + ? * (1 - ? + ? * COALESCE(c.length, 0) / ?))) AS score, "
+                "SUM(w.idf) FROM candidates k CROSS JOIN weights w CROSS JOIN postings p "
+                "JOIN chunks c ON c.id = p.id "
+                "WHERE p.id = k.id AND p.term = w.term "  # CROSS JOIN keeps this order: one index seek per pair
+                "GROUP BY p.id ORDER BY score DESC, p.id LIMIT ?",
+                [value for term in matched for value in (term, weights[term])] + candidate_params
+                + [K1 + 1, K1, B, B, avg_length or 1.0, limit]
+            ).fetchall()
+
+        return [(doc_id, score, matched_idf / total_idf) for doc_id, score, matched_idf in rows]
+
+    def find_hashes(self, hashes):
+        """
+        Look up which chunk hashes are already stored.
+
+        Args:
+            hashes (list): Chunk hashes to check
+
+        Returns:
+            dict: Mapping of each stored hash to its vector id
+        """
+        hashes = list(hashes)
+        found = {}
+
+        with self._lock:
+            for start in range(0, len(hashes), SQL_BATCH_SIZE):
+                batch = hashes[start:start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT chunk_hash, id FROM chunks WHERE chunk_hash IN ({placeholders})",
+                    batch
+                ).fetchall()
+                found.update(rows)
+
+        return found
+
+    def ids_for_sources(self, sources):
+        """
+        Return the vector ids of every chunk from the given source files.
+
+        Args:
+            sources (list): Source file names, as stored in chunk metadata
+
+        Returns:
+            list: Integer vector ids
+        """
+        sources = list(sources)
+        ids = []
+
+        with self._lock:
+            for start in range(0, len(sources), SQL_BATCH_SIZE):
+                batch = sources[start:start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT id FROM chunks WHERE source IN ({placeholders})",
+                    batch
+                ).fetchall()
+                ids.extend(row[0] for row in rows)
+
+        return ids
+
+    def list_sources(self):
+        """
+        Return every source file in the docstore with its chunk count.
+
+        Returns:
+            list: (source, chunk count) tuples sorted by source
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT source, COUNT(*) FROM chunks GROUP BY source ORDER BY source"
+            ).fetchall()
+
+    def delete(self, ids):
+        """
+        Delete the rows for the given vector ids.
+
+        Args:
+            ids (list): Integer vector ids
+        """
+        ids = [int(i) for i in ids]
+
+        with self._lock:
+            self._delete_postings(ids)
+            for start in range(0, len(ids), SQL_BATCH_SIZE):
+                batch = ids[start:start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+            self._conn.commit()
+
+    def get_by_ids(self, ids):
+        """
+        Fetch documents for the given vector ids in as few queries as possible.
+
+        Args:
+            ids (iterable): Integer vector ids
+
+        Returns:
+            dict: Mapping of vector id to Document for every id found
+        """
+        ids = sorted({int(i) for i in ids})
+        by_id = {}
+
+        with self._reader() as conn:
+            for start in range(0, len(ids), SQL_BATCH_SIZE):
+                batch = ids[start:start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT id, text, metadata FROM chunks WHERE id IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for row in rows:
+                    by_id[row[0]] = Document(page_content=row[1], metadata=json.loads(row[2]))
+
+        return by_id
+
+    def next_id(self):
+        """Return the next unused vector id."""
+        with self._lock:
+            max_id = self._conn.execute("SELECT MAX(id) FROM chunks").fetchone()[0]
+        return 0 if max_id is None else max_id + 1
+
+    def save(self, path):
+        """
+        Write a consistent copy of the docstore to path.
+
+        Args:
+            path (str): Destination SQLite file
+        """
+        dest = sqlite3.connect(str(path))
+        try:
+            with self._lock:
+                self._conn.backup(dest)
+        finally:
+            dest.close()
+
+    def close(self):
+        """Close the connection, removing the file if this is a scratch copy."""
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+            for conn in self._idle_readers:
+                conn.close()
+            self._idle_readers = []
+        if self._is_scratch:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
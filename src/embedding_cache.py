@@ -0,0 +1,184 @@
+"""
+Persistent embedding cache
+
+Vectors are appended to a flat float32 file that is memory-mapped for
+reads, and a SQLite table maps each text's SHA-256 hash to its row in that
+file. Each (model, backend) pair gets its own directory, so switching models
+never returns stale vectors. Rebuilding an index with a different index
+type or chunk order then only pays for index construction.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Cache settings
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache")
+VECTORS_FILENAME = "vectors.f32"
+INDEX_FILENAME = "index.sqlite"
+SQL_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    hash BLOB PRIMARY KEY,
+    row INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def hash_text(text):
+    """Return the SHA-256 digest used as a text's cache key."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """
+    On-disk vector cache for one embeddings model.
+
+    Appends happen inside a SQLite write transaction, which also serializes
+    writers from different processes. Row offsets are taken from the vector
+    file's size, so a crash between writing vectors and committing their
+    index entries only leaves unreferenced bytes behind.
+    """
+
+    def __init__(self, model_name, backend, root=EMBEDDING_CACHE_DIR):
+        """
+        Open (or create) the cache for a model.
+
+        Args:
+            model_name (str): Embeddings model name
+            backend (str): Embeddings backend; vectors differ slightly between backends
+            root (str): Directory holding the caches of all models
+        """
+        slug = re.sub(r"[^\w.-]+", "_", f"{model_name}-{backend}")
+        self.path = os.path.join(root, slug)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.vectors_path = os.path.join(self.path, VECTORS_FILENAME)
+        self._conn = sqlite3.connect(
+            os.path.join(self.path, INDEX_FILENAME), check_same_thread=False, timeout=60
+        )
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._mmap = None
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dimension'").fetchone()
+        self.dimension = int(row[0]) if row else None
+
+    def _rows(self, hashes):
+        """Return a hash -> row mapping for the cached hashes."""
+        rows = {}
+        for start in range(0, len(hashes), SQL_BATCH_SIZE):
+            batch = hashes[start:start + SQL_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._conn.execute(
+                f"SELECT hash, row FROM vectors WHERE hash IN ({placeholders})", batch
+            ).fetchall())
+        return rows
+
+    def _vectors(self, min_rows):
+        """Return a memory map of the vector file covering at least min_rows rows."""
+        if self._mmap is None or len(self._mmap) < min_rows:
+            n_rows = os.path.getsize(self.vectors_path) // (4 * self.dimension)
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                   shape=(n_rows, self.dimension))
+        return self._mmap
+
+    def get_many(self, hashes):
+        """
+        Look up cached vectors.
+
+        Args:
+            hashes (list): Text hashes from hash_text()
+
+        Returns:
+            dict: hash -> float32 vector for every cached hash
+        """
+        if self.dimension is None or not hashes:
+            return {}
+
+        with self._lock:
+            rows = self._rows(list(hashes))
+            if not rows:
+                return {}
+            vectors = self._vectors(max(rows.values()) + 1)
+            return {h: np.array(vectors[row]) for h, row in rows.items()}
+
+    def put_many(self, hashes, vectors):
+        """
+        Add vectors to the cache, skipping hashes that are already cached.
+
+        Args:
+            hashes (list): Text hashes from hash_text()
+            vectors (np.ndarray): float32 array of shape (len(hashes), dim)
+        """
+        if not len(hashes):
+            return
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        row_bytes = 4 * vectors.shape[1]
+
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+
+                if self.dimension is None:
+                    self.dimension = vectors.shape[1]
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO meta (key, value) VALUES ('dimension', ?)",
+                        (str(self.dimension),)
+                    )
+                elif vectors.shape[1] != self.dimension:
+                    raise ValueError(f"Vector dimension {vectors.shape[1]} does not match cache ({self.dimension})")
+
+                # Rows to append: hashes not yet cached, first occurrence only
+                seen = set(self._rows(list(hashes)))
+                new = []
+                for i, h in enumerate(hashes):
+                    if h not in seen:
+                        seen.add(h)
+                        new.append(i)
+                if not new:
+                    self._conn.rollback()
+                    return
+
+                size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+                start = size // row_bytes
+                with open(self.vectors_path, "ab") as f:
+                    # Drop any partial row left by an interrupted write
+                    f.truncate(start * row_bytes)
+                    f.write(vectors[new].tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                self._conn.executemany(
+                    "INSERT INTO vectors (hash, row) VALUES (?, ?)",
+                    [(hashes[i], start + offset) for offset, i in enumerate(new)]
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def count(self):
+        """Return the number of cached vectors."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self):
+        """Close the index connection."""
+        with self._lock:
+            self._mmap = None
+            self._conn.close()
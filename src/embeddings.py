@@ -0,0 +1,467 @@
+"""
+Shared embedding provider
+
+Every module that needs sentence embeddings gets them from get_embeddings(),
+so the model is loaded once per process. The backend is chosen with
+EMBEDDINGS_BACKEND:
+
+    huggingface  LangChain HuggingFaceEmbeddings (reference, default)
+    onnx         sentence-transformers on ONNX Runtime, for CPU-only servers
+    torch_int8   PyTorch with int8 dynamic quantization of the Linear layers
+    mock         Zero vectors, for running without a model
+
+Bulk ingestion embeds through embed_texts(), which reuses vectors from the
+persistent embedding cache, batches the remaining chunks and, with
+EMBEDDINGS_WORKERS > 1, spreads the batches over worker processes that each
+load their own copy of the model.
+
+Optimized backends can be compared with the reference model by running
+    python run_directly.py src/embeddings.py parity --backend onnx
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the project root directory to the Python path when run directly
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.embedding_cache import EmbeddingCache, hash_text
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Embedding settings
+EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDINGS_DIMENSION = 384
+EMBEDDINGS_BACKENDS = ("huggingface", "onnx", "torch_int8", "mock")
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "huggingface")
+EMBEDDINGS_BATCH_SIZE = int(os.getenv("EMBEDDINGS_BATCH_SIZE", "32"))
+ONNX_MODEL_FILE = os.getenv("EMBEDDINGS_ONNX_FILE")  # e.g. onnx/model_qint8_avx512_vnni.onnx
+
+# Bulk embedding settings. Each worker process loads its own model copy.
+EMBEDDINGS_WORKERS = int(os.getenv("EMBEDDINGS_WORKERS", "1"))
+BULK_PROGRESS_INTERVAL = 10  # Seconds between progress log lines
+
+# Persistent cache of document vectors, keyed by model and text hash
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") == "1"
+
+# Minimum cosine similarity to the reference model for a backend to pass
+PARITY_MIN_COSINE = 0.99
+
+PARITY_TEXTS = [
+    "What is the Treaty of Varnok-7?",
+    "How do I forecast monthly sales with a moving average in Excel?",
+    "Linear regression fits a straight line that minimizes the squared error.",
+    "The ARIMA model combines autoregression, differencing and a moving average.",
+    "Upload a PDF and ask questions about its contents.",
+    "Seasonality is a pattern that repeats over a fixed period, such as a year.",
+    "Who founded Google?",
+    "R provides the forecast package for time series analysis.",
+]
+
+# Shared embeddings models, one per (backend, model name)
+_instances = {}
+_instances_lock = threading.Lock()
+
+# Model loaded by each bulk embedding worker process
+_worker_embeddings = None
+
+# Persistent cache for the configured model, opened on first use
+_cache = None
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    LangChain embeddings wrapper around a sentence-transformers model.
+
+    Text is preprocessed exactly like HuggingFaceEmbeddings so that every
+    backend produces vectors comparable with the reference model.
+    """
+
+    def __init__(self, client, batch_size=EMBEDDINGS_BATCH_SIZE):
+        self.client = client
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts):
+        """Embed a list of texts."""
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = self.client.encode(texts, batch_size=self.batch_size, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        """Embed a single query."""
+        return self.embed_documents([text])[0]
+
+class MockEmbeddings(Embeddings):
+    """Mock embedding model."""
+
+    def embed_documents(self, texts):
+        return [[0.0] * EMBEDDINGS_DIMENSION for _ in texts]
+
+    def embed_query(self, text):
+        return [0.0] * EMBEDDINGS_DIMENSION
+
+def create_embeddings(backend=None, model_name=None):
+    """
+    Load a new embeddings model.
+
+    Most callers should use get_embeddings() instead, which shares one
+    instance per process.
+
+    Args:
+        backend (str): One of EMBEDDINGS_BACKENDS; defaults to EMBEDDINGS_BACKEND
+        model_name (str): sentence-transformers model; defaults to EMBEDDINGS_MODEL
+
+    Returns:
+        Embeddings: LangChain-compatible embeddings model
+    """
+    backend = backend or EMBEDDINGS_BACKEND
+    model_name = model_name or EMBEDDINGS_MODEL
+
+    if backend not in EMBEDDINGS_BACKENDS:
+        raise ValueError(f"Unknown embeddings backend '{backend}', expected one of {EMBEDDINGS_BACKENDS}")
+
+    if backend == "mock":
+        return MockEmbeddings()
+
+    if backend == "huggingface":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        # Needs sentence-transformers>=3.2 with optimum[onnxruntime]; models
+        # without a bundled ONNX file are exported on first load
+        model_kwargs = {"file_name": ONNX_MODEL_FILE} if ONNX_MODEL_FILE else None
+        client = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    else:
+        import torch
+        client = SentenceTransformer(model_name, device="cpu")
+        client = torch.quantization.quantize_dynamic(client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    logger.info(f"Loaded {model_name} with the {backend} backend")
+    return SentenceTransformerEmbeddings(client)
+
+def get_embeddings(backend=None, model_name=None):
+    """
+    Return the shared embeddings model, loading it on first use.
+
+    Args:
+        backend (str): One of EMBEDDINGS_BACKENDS; defaults to EMBEDDINGS_BACKEND
+        model_name (str): sentence-transformers model; defaults to EMBEDDINGS_MODEL
+
+    Returns:
+        Embeddings: LangChain-compatible embeddings model
+    """
+    key = (backend or EMBEDDINGS_BACKEND, model_name or EMBEDDINGS_MODEL)
+
+    embeddings = _instances.get(key)
+    if embeddings is None:
+        with _instances_lock:
+            embeddings = _instances.get(key)
+            if embeddings is None:
+                try:
+                    embeddings = create_embeddings(*key)
+                except Exception as e:
+                    logger.error(f"Error initializing embeddings model: {str(e)}")
+                    raise
+                _instances[key] = embeddings
+
+    return embeddings
+
+def _init_worker(backend, model_name, threads):
+    """Load the model once in a bulk embedding worker process."""
+    global _worker_embeddings
+
+    # Split the cores between workers instead of every worker using all of them
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    _worker_embeddings = create_embeddings(backend, model_name)
+
+def _embed_batch(texts):
+    """Embed one batch in a worker process."""
+    return np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+
+def iter_embedding_batches(texts, embeddings=None, batch_size=None, workers=None):
+    """
+    Embed texts in batches, yielding each batch's vectors in input order.
+
+    With more than one worker, batches are embedded by a pool of processes
+    that each load the configured backend; at most two batches per worker
+    are in flight, so vectors stream out while later batches are embedded.
+
+    Args:
+        texts (list): Texts to embed
+        embeddings (Embeddings): Model for in-process embedding; defaults to
+                                 the shared model
+        batch_size (int): Texts per batch; defaults to EMBEDDINGS_BATCH_SIZE
+        workers (int): Worker processes; defaults to EMBEDDINGS_WORKERS
+
+    Yields:
+        np.ndarray: float32 vectors for the next batch
+    """
+    batch_size = batch_size or EMBEDDINGS_BATCH_SIZE
+    workers = workers or EMBEDDINGS_WORKERS
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    if len(batches) < 2:
+        workers = 1
+    yield from _iter_batch_vectors(batches, embeddings, min(workers, len(batches)))
+
+def _iter_batch_vectors(batches, embeddings, workers):
+    """
+    Embed an iterable of text batches, consuming it lazily.
+
+    Yields each batch's float32 vectors in order, or None for an empty
+    batch. With more than one worker, a single process pool embeds the
+    whole stream.
+    """
+    if workers <= 1:
+        embeddings = embeddings or get_embeddings()
+        for batch in batches:
+            yield np.asarray(embeddings.embed_documents(batch), dtype=np.float32) if batch else None
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(EMBEDDINGS_BACKEND, EMBEDDINGS_MODEL, threads)
+    ) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(_embed_batch, batch) if batch else None)
+            if len(pending) >= 2 * workers:
+                future = pending.popleft()
+                yield future.result() if future is not None else None
+        while pending:
+            future = pending.popleft()
+            yield future.result() if future is not None else None
+
+def get_embedding_cache():
+    """Return the persistent embedding cache for the configured model."""
+    global _cache
+
+    if _cache is None:
+        with _instances_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(EMBEDDINGS_MODEL, EMBEDDINGS_BACKEND)
+    return _cache
+
+def _uses_configured_model(embeddings):
+    """Return True if embeddings is the shared model the cache is keyed by."""
+    return embeddings is None or embeddings is _instances.get((EMBEDDINGS_BACKEND, EMBEDDINGS_MODEL))
+
+def embed_texts(texts, embeddings=None, batch_size=None, workers=None):
+    """
+    Embed many texts for indexing and log the throughput in chunks/sec.
+
+    Texts embedded before by the configured model are read from the
+    persistent embedding cache; only the rest are embedded, once per
+    distinct text, and then added to the cache batch by batch.
+
+    Args:
+        texts (list): Texts to embed
+        embeddings (Embeddings): Model for in-process embedding; defaults to
+                                 the shared model
+        batch_size (int): Texts per batch; defaults to EMBEDDINGS_BATCH_SIZE
+        workers (int): Worker processes; defaults to EMBEDDINGS_WORKERS
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), dim)
+    """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, EMBEDDINGS_DIMENSION), dtype=np.float32)
+
+    workers = workers or EMBEDDINGS_WORKERS
+    cache = get_embedding_cache() if EMBEDDING_CACHE_ENABLED and _uses_configured_model(embeddings) else None
+
+    # Group positions by text hash so each distinct text is embedded once
+    hashes = [hash_text(text) for text in texts]
+    positions = {}
+    for i, h in enumerate(hashes):
+        positions.setdefault(h, []).append(i)
+
+    cached = cache.get_many(list(positions)) if cache is not None else {}
+    missing = [h for h in positions if h not in cached]
+
+    dim = len(next(iter(cached.values()))) if cached else None
+    vectors = np.empty((len(texts), dim), dtype=np.float32) if dim else None
+    for h, vector in cached.items():
+        vectors[positions[h]] = vector
+
+    done = 0
+    start = last_report = time.perf_counter()
+    missing_texts = [texts[positions[h][0]] for h in missing]
+
+    for batch in iter_embedding_batches(missing_texts, embeddings, batch_size, workers):
+        if vectors is None:
+            vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+
+        batch_hashes = missing[done:done + len(batch)]
+        for h, vector in zip(batch_hashes, batch):
+            vectors[positions[h]] = vector
+        if cache is not None:
+            cache.put_many(batch_hashes, batch)
+        done += len(batch)
+
+        now = time.perf_counter()
+        if now - last_report >= BULK_PROGRESS_INTERVAL:
+            logger.info(f"Embedded {done}/{len(missing)} chunks ({done / (now - start):.1f} chunks/sec)")
+            last_report = now
+
+    elapsed = time.perf_counter() - start
+    if cache is not None:
+        logger.info(f"Embedding cache: {len(texts) - sum(len(positions[h]) for h in missing)} "
+                    f"of {len(texts)} chunks already embedded")
+    if missing:
+        logger.info(
+            f"Embedded {len(missing)} chunks in {elapsed:.1f}s "
+            f"({len(missing) / elapsed if elapsed else float('inf'):.1f} chunks/sec, {workers} workers)"
+        )
+    return vectors
+
+def embed_text_batches(batches, embeddings=None, workers=None):
+    """
+    Embed a stream of text batches for indexing, one batch at a time.
+
+    Like embed_texts(), but for batches that arrive over time, such as
+    from the ingest pipeline: the iterable is consumed lazily, cached
+    vectors are reused, and with EMBEDDINGS_WORKERS > 1 one process pool
+    serves the whole stream.
+
+    Args:
+        batches (iterable): Lists of texts
+        embeddings (Embeddings): Model for in-process embedding; defaults to
+                                 the shared model
+        workers (int): Worker processes; defaults to EMBEDDINGS_WORKERS
+
+    Yields:
+        np.ndarray: float32 array of shape (len(batch), dim) for each batch, in order
+    """
+    workers = workers or EMBEDDINGS_WORKERS
+    cache = get_embedding_cache() if EMBEDDING_CACHE_ENABLED and _uses_configured_model(embeddings) else None
+    pending = deque()
+
+    def missing_texts():
+        """Look each batch up in the cache and pass on the texts still to embed."""
+        for texts in batches:
+            hashes = [hash_text(text) for text in texts]
+            cached = cache.get_many(list(set(hashes))) if cache is not None else {}
+
+            missing = {}
+            for text, h in zip(texts, hashes):
+                if h not in cached and h not in missing:
+                    missing[h] = text
+
+            pending.append((hashes, cached, list(missing)))
+            yield list(missing.values())
+
+    n_texts = n_embedded = 0
+    start = time.perf_counter()
+
+    for embedded in _iter_batch_vectors(missing_texts(), embeddings, workers):
+        hashes, cached, missing = pending.popleft()
+
+        found = dict(cached)
+        if embedded is not None:
+            found.update(zip(missing, embedded))
+            if cache is not None:
+                cache.put_many(missing, embedded)
+
+        n_texts += len(hashes)
+        n_embedded += len(missing)
+        yield np.stack([found[h] for h in hashes]).astype(np.float32, copy=False)
+
+    elapsed = time.perf_counter() - start
+    if n_texts:
+        logger.info(
+            f"Embedded {n_embedded} of {n_texts} chunks ({n_texts - n_embedded} from cache) in {elapsed:.1f}s "
+            f"({n_embedded / elapsed if elapsed else float('inf'):.1f} chunks/sec, {workers} workers)"
+        )
+
+def check_parity(backend, texts=None, reference_backend="huggingface", min_cosine=PARITY_MIN_COSINE):
+    """
+    Compare a backend's embeddings with the reference model.
+
+    Args:
+        backend (str): Backend to check
+        texts (list): Texts to embed; defaults to PARITY_TEXTS
+        reference_backend (str): Backend treated as ground truth
+        min_cosine (float): Lowest acceptable cosine similarity for any text
+
+    Returns:
+        dict: backend, texts, min_cosine, mean_cosine and passed
+    """
+    texts = texts or PARITY_TEXTS
+
+    candidate = np.asarray(create_embeddings(backend).embed_documents(texts), dtype=np.float32)
+    reference = np.asarray(create_embeddings(reference_backend).embed_documents(texts), dtype=np.float32)
+
+    cosine = (candidate * reference).sum(axis=1) / (
+        np.linalg.norm(candidate, axis=1) * np.linalg.norm(reference, axis=1)
+    )
+
+    return {
+        "backend": backend,
+        "texts": len(texts),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "passed": bool(cosine.min() >= min_cosine)
+    }
+
+def _parity_command(args):
+    """Check a backend against the reference model."""
+    texts = list(PARITY_TEXTS)
+
+    if args.sample:
+        from src.process_pdfs import load_processed_documents
+        documents = load_processed_documents()
+        step = max(1, len(documents) // args.sample)
+        texts += [doc.page_content for doc in documents[::step][:args.sample]]
+
+    result = check_parity(args.backend, texts, min_cosine=args.min_cosine)
+    print(
+        f"{result['backend']}: min cosine {result['min_cosine']:.4f}, "
+        f"mean {result['mean_cosine']:.4f} over {result['texts']} texts -> "
+        f"{'PASS' if result['passed'] else 'FAIL'}"
+    )
+    return 0 if result["passed"] else 1
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Shared embedding provider")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parity_parser = subparsers.add_parser("parity", help="Compare a backend with the reference model")
+    parity_parser.add_argument("--backend", default="onnx", choices=EMBEDDINGS_BACKENDS)
+    parity_parser.add_argument("--sample", type=int, default=0,
+                               help="Also compare N chunks from data/processed_files")
+    parity_parser.add_argument("--min-cosine", type=float, default=PARITY_MIN_COSINE)
+
+    args = parser.parse_args(argv)
+    return _parity_command(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
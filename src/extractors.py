@@ -0,0 +1,56 @@
+"""
+Text extractors for the non-PDF raw file formats
+
+Each extractor yields a file's text as (page number, text) sections, the
+input iter_chunks() expects. These formats have no pages, so the page
+number is always None and their chunks carry no page metadata. Sections
+are joined with a paragraph break before splitting, so they should end
+where the splitter would prefer to cut anyway.
+"""
+
+import csv
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def iter_docx_sections(path):
+    """
+    Extract the text of a Word (.docx) document.
+
+    Yields:
+        tuple: (None, document text)
+    """
+    # Optional dependency, only needed when there are Word documents
+    import docx2txt
+
+    yield None, docx2txt.process(str(path)) or ""
+
+def iter_csv_rows(path):
+    """
+    Extract a CSV file one row at a time.
+
+    Rows are written as "column: value" lines, as LangChain's CSVLoader
+    does, so each row reads as a small self-contained record.
+
+    Yields:
+        tuple: (None, row text)
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            yield None, "\n".join(
+                f"{str(key).strip()}: {str(value if value is not None else '').strip()}"
+                for key, value in row.items()
+            )
+
+def iter_text_sections(path):
+    """
+    Extract the text of a plain text file.
+
+    Yields:
+        tuple: (None, file text)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        yield None, f.read()
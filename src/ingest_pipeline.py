@@ -0,0 +1,365 @@
+"""
+Streaming ingest pipeline
+
+Runs extract -> chunk -> embed -> index as stages connected by bounded
+queues, so documents flow through in batches instead of being loaded,
+embedded and indexed as whole lists:
+
+- extract/chunk: raw files are processed (in worker processes when
+  PDF_WORKERS > 1) and their chunks written to the processed files
+  directory; each file is handed on as soon as it is done.
+- batch: processed files are read back lazily, PIPELINE_BATCH_SIZE chunks
+  at a time, dropping chunks that are already indexed.
+- embed: batches are embedded (in worker processes when
+  EMBEDDINGS_WORKERS > 1), reusing cached vectors.
+- index: chunks are written to the docstore as they arrive; the vectors are
+  added to the FAISS shards once all batches are in, and the result is
+  published as one new index version.
+
+Each queue holds at most PIPELINE_QUEUE_SIZE items, so a slow stage blocks
+the stages feeding it and memory stays bounded by the batch size rather
+than the corpus size (only the vectors themselves are held until the end).
+An error in any stage stops the others and nothing is published. The
+writable index copy (and the embeddings model) is only loaded once a file
+is handed on or a source is removed, so a run with nothing to do is cheap.
+"""
+
+import os
+import sys
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from contextlib import ExitStack
+from itertools import chain
+
+# Add the project root directory to the Python path when run directly
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.docstore import SQLiteDocstore
+from src.embeddings import embed_text_batches, get_embeddings
+from src.manifest import MANIFEST_FILENAME, Manifest
+from src.process_pdfs import (
+    PROCESSED_FILES_DIR, find_processed_file, iter_processed_file, processed_file_paths, processed_source_name,
+    sync_processed_files
+)
+from src.vector_db import (
+    FAISS_INDEX_TYPE, SHARD_BY, VectorStore, get_current_index_version, index_write_lock, invalidate_retriever,
+    load_faiss_index, save_index_version
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Pipeline settings
+PIPELINE_BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "512"))  # Chunks per embedding batch
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))  # Items buffered between stages
+POLL_INTERVAL = 0.1  # Seconds between checks for an aborted pipeline
+
+_DONE = object()
+
+class PipelineAborted(Exception):
+    """Raised in a stage when another stage has failed."""
+
+class _Channel:
+    """
+    Bounded queue between two pipeline stages.
+
+    put() blocks while the queue is full, which is what slows a stage down
+    to the pace of the next one. Both ends give up once the pipeline is
+    aborted, so a failing stage never leaves the others blocked.
+    """
+
+    def __init__(self, abort, size=PIPELINE_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=max(1, size))
+        self._abort = abort
+
+    def put(self, item):
+        """Hand an item to the next stage, waiting while the queue is full."""
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                self._queue.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def close(self):
+        """Tell the next stage that no more items will follow."""
+        self.put(_DONE)
+
+    def __iter__(self):
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                item = self._queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+class _Stage(threading.Thread):
+    """Pipeline stage thread that records its result or error."""
+
+    def __init__(self, name, target, abort):
+        super().__init__(name=f"ingest-{name}", daemon=True)
+        self._target_fn = target
+        self._abort = abort
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self._target_fn()
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self.error = e
+            self._abort.set()
+
+class _LazyStore:
+    """
+    Writable copy of the index, opened when a stage first needs it.
+
+    Loading the index copies the whole docstore and loads the embeddings
+    model, so a run that finds nothing to change never opens it. The index
+    write lock is taken just before loading and held until close(), after
+    the new version is published.
+    """
+
+    def __init__(self):
+        self.db = None
+        self._lock = threading.Lock()
+        self._held = ExitStack()
+
+    def get(self):
+        """Return the writable store, taking the index write lock and opening it on first use."""
+        with self._lock:
+            if self.db is None:
+                self._held.enter_context(index_write_lock())
+                self.db = _writable_store()
+            return self.db
+
+    def close(self):
+        """Close the store, if it was opened, and release the index write lock."""
+        try:
+            if self.db is not None:
+                self.db.close()
+        finally:
+            self._held.close()
+
+def _writable_store():
+    """Load a writable copy of the current index, or start an empty one."""
+    db = load_faiss_index(writable=True)
+    if db is not None:
+        return db
+
+    # Never replace an index that exists but failed to load
+    if get_current_index_version() is not None:
+        raise RuntimeError("Could not load the current FAISS index")
+
+    logger.info("Creating new FAISS index")
+    return VectorStore([], SQLiteDocstore.scratch(), get_embeddings(), FAISS_INDEX_TYPE, SHARD_BY)
+
+def _batch_stage(store, files, batches, replace):
+    """Read processed files and pass on batches of chunks that still need indexing."""
+    seen = set()
+    n_removed = 0
+
+    for name in files:
+        db = store.get()
+        if replace:
+            n_removed += db.remove_ids(db.docstore.ids_for_sources([name]))
+
+        path = find_processed_file(name)
+        if path is None:
+            logger.warning(f"No processed file found for {name}")
+            continue
+
+        batch = []
+        for doc in iter_processed_file(path):
+            batch.append(doc)
+            if len(batch) >= PIPELINE_BATCH_SIZE:
+                _put_new_chunks(db, batch, batches, seen)
+                batch = []
+        if batch:
+            _put_new_chunks(db, batch, batches, seen)
+
+    batches.close()
+    return n_removed
+
+def _put_new_chunks(db, documents, batches, seen):
+    """Drop already indexed chunks from a batch and hand the rest on."""
+    documents, hashes = db.new_chunks(documents)
+    new = [(doc, h) for doc, h in zip(documents, hashes) if h not in seen]
+    if new:
+        seen.update(h for _, h in new)
+        batches.put(([doc for doc, _ in new], [h for _, h in new]))
+
+def _embed_stage(store, batches, embedded):
+    """Embed batches of chunks as they arrive."""
+    pending = deque()
+    batches = iter(batches)
+
+    # The store (and so the model) is only needed once there is something to embed
+    first = next(batches, None)
+    if first is None:
+        embedded.close()
+        return
+
+    def texts():
+        for documents, hashes in chain([first], batches):
+            pending.append((documents, hashes))
+            yield [doc.page_content for doc in documents]
+
+    for vectors in embed_text_batches(texts(), store.get().embeddings):
+        documents, hashes = pending.popleft()
+        embedded.put((documents, hashes, vectors))
+
+    embedded.close()
+
+def _run(produce, replace):
+    """
+    Run the pipeline and publish the result as a new index version.
+
+    Args:
+        produce (callable): Called with a function to hand on each file
+                            name to index; returns the names of sources to
+                            remove from the index
+        replace (bool): Remove a source's existing chunks before adding its
+                        new ones, instead of only adding chunks not yet indexed
+
+    Returns:
+        dict: Counts of files, added and removed chunks, and the new index
+              version (None if nothing changed)
+    """
+    start = time.perf_counter()
+    store = _LazyStore()
+
+    try:
+        abort = threading.Event()
+        files = _Channel(abort)
+        batches = _Channel(abort)
+        embedded = _Channel(abort)
+        n_files = [0]
+
+        def hand_on(name):
+            n_files[0] += 1
+            files.put(name)
+
+        def extract():
+            removed = produce(hand_on)
+            files.close()
+            return removed
+
+        stages = [
+            _Stage("extract", extract, abort),
+            _Stage("batch", lambda: _batch_stage(store, files, batches, replace), abort),
+            _Stage("embed", lambda: _embed_stage(store, batches, embedded), abort)
+        ]
+        for stage in stages:
+            stage.start()
+
+        # The index stage runs here
+        added = []
+        try:
+            items = iter(embedded)
+            first = next(items, None)
+            if first is not None:
+                added = store.get().add_embedded(chain([first], items))
+        except PipelineAborted:
+            added = []
+        except BaseException:
+            abort.set()
+            raise
+        finally:
+            for stage in stages:
+                stage.join()
+
+        for stage in stages:
+            if stage.error is not None:
+                raise stage.error
+
+        n_removed = stages[1].result
+        removed = list(stages[0].result or ())
+        if removed:
+            db = store.get()
+            n_removed += db.remove_ids(db.docstore.ids_for_sources(removed))
+
+        version = None
+        if added or n_removed:
+            version = save_index_version(store.db)
+            invalidate_retriever()
+        else:
+            logger.info("No changes to apply; index is up to date")
+    finally:
+        store.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Ingested {n_files[0]} files in {elapsed:.1f}s: added {len(added)} chunks "
+        f"({len(added) / elapsed if elapsed else 0:.1f} chunks/sec), removed {n_removed}"
+    )
+    return {"files": n_files[0], "added": len(added), "removed": n_removed, "version": version}
+
+def ingest_raw_files(chunk_size=1000, chunk_overlap=200, workers=None, force=False, names=None):
+    """
+    Process new or changed raw files and index them in one streaming pass.
+
+    Each file's chunks replace whatever the index holds for it, and files
+    removed from raw_files are dropped from the index. The manifest is only
+    saved once the new index version is published, so files are processed
+    again if indexing fails.
+
+    Args:
+        chunk_size (int): Size of each text chunk
+        chunk_overlap (int): Overlap between chunks
+        workers (int): PDF worker processes; defaults to PDF_WORKERS
+        force (bool): Re-process every file, even unchanged ones
+        names (iterable): Only check these raw file names; defaults to the
+                          whole raw_files directory
+
+    Returns:
+        dict: File names by outcome, as returned by sync_processed_files()
+    """
+    manifest = Manifest(PROCESSED_FILES_DIR / MANIFEST_FILENAME)
+    changes = {}
+
+    def produce(hand_on):
+        changes.update(sync_processed_files(chunk_size, chunk_overlap, workers, force,
+                                            on_processed=hand_on, manifest=manifest, names=names))
+        return changes["removed"]
+
+    _run(produce, replace=True)
+    manifest.save()
+    return changes
+
+def ingest_processed_files(names=None):
+    """
+    Index processed files in one streaming pass.
+
+    Only chunks that are not yet indexed are added.
+
+    Args:
+        names (list): Source file names to index; defaults to every processed file
+
+    Returns:
+        dict: Counts of files, added and removed chunks, and the new index version
+    """
+    def produce(hand_on):
+        if names is None:
+            sources = [processed_source_name(path) for path in processed_file_paths()]
+        else:
+            sources = names
+        for name in sources:
+            hand_on(name)
+        return ()
+
+    return _run(produce, replace=False)
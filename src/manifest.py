@@ -0,0 +1,158 @@
+"""
+Raw files manifest
+
+Records, for every processed raw file, its size, modification time,
+content hash and the chunking parameters it was processed with. Ingestion
+compares the raw files directory against it to re-process only new or
+changed files and to find files that were removed.
+
+Size and modification time are checked first, so an unchanged file costs a
+single stat() call; the content is only hashed when they differ, so a file
+that was merely touched or copied again is not re-processed.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+HASH_BLOCK_SIZE = 1 << 20
+
+def file_sha256(path):
+    """Return the hex SHA-256 digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_fingerprint(path):
+    """
+    Return the state of a raw file as recorded in the manifest.
+
+    Returns:
+        dict: size, mtime_ns and sha256 of the file
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(path)}
+
+class Manifest:
+    """
+    Processing state of the files in the raw files directory.
+
+    Entries are keyed by file name and hold size, mtime_ns, sha256, the
+    processing params and the name of the output file. The manifest is
+    written atomically by save().
+    """
+
+    def __init__(self, path):
+        """
+        Load the manifest, or start an empty one.
+
+        Args:
+            path (Path): Manifest file, usually in the processed files directory
+        """
+        self.path = Path(path)
+        self.entries = {}
+        self._dirty = False
+
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.entries = data.get("files", {})
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable manifest {self.path}: {str(e)}")
+
+    def is_current(self, name, path, params):
+        """
+        Check whether a raw file was processed in its current state.
+
+        Args:
+            name (str): Manifest key of the file
+            path (Path): Path to the raw file
+            params (dict): Processing parameters, e.g. chunk size and overlap
+
+        Returns:
+            bool: True if the file and params are unchanged and the output exists
+        """
+        entry = self.entries.get(name)
+        if entry is None or entry.get("params") != params:
+            return False
+        if not (self.path.parent / entry["output"]).exists():
+            return False
+
+        stat = os.stat(path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+
+        # Touched but possibly not modified; compare the content
+        if file_sha256(path) != entry["sha256"]:
+            return False
+
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self._dirty = True
+        return True
+
+    def record(self, name, fingerprint, params, output):
+        """
+        Record that a raw file was processed.
+
+        Args:
+            name (str): Manifest key of the file
+            fingerprint (dict): file_fingerprint() of the file, taken before processing
+            params (dict): Processing parameters used
+            output (str): Name of the output file, relative to the manifest's directory
+        """
+        self.entries[name] = dict(fingerprint, params=params, output=output)
+        self._dirty = True
+
+    def changed(self):
+        """Mark the manifest as changed after editing an entry in place."""
+        self._dirty = True
+
+    def forget(self, name):
+        """
+        Remove a file's entry.
+
+        Returns:
+            dict: The removed entry, or None if the file was not recorded
+        """
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self._dirty = True
+        return entry
+
+    def removed(self, names):
+        """
+        Return the recorded files that are no longer present.
+
+        Args:
+            names (iterable): Names of the files currently in the raw files directory
+
+        Returns:
+            list: Sorted names of recorded files missing from names
+        """
+        return sorted(set(self.entries) - set(names))
+
+    def save(self):
+        """Write the manifest if it changed."""
+        if not self._dirty:
+            return
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -2,13 +2,22 @@ import os
 import logging
 import json
 import sys
+import gzip
+import bisect
+import shutil
+import multiprocessing
+from collections import deque
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Add the project root directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from pypdf import PdfReader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.chunker import CHUNK_TOKEN_ENCODING, create_chunker
+from src.extractors import iter_csv_rows, iter_docx_sections, iter_text_sections
+from src.manifest import MANIFEST_FILENAME, Manifest, file_fingerprint
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
@@ -19,6 +28,62 @@ logger = logging.getLogger(__name__)
 RAW_FILES_DIR = Path('data/raw_files')
 PROCESSED_FILES_DIR = Path('data/processed_files')
 
+# Parallel processing settings
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_SPLIT_MIN_PAGES = int(os.getenv("PDF_SPLIT_MIN_PAGES", "200"))  # Larger PDFs are extracted in page ranges
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "50"))
+RAW_FILE_THREADS = int(os.getenv("RAW_FILE_THREADS", "4"))  # Threads for formats that are cheap to extract
+
+# Streaming chunker settings
+PAGE_SEPARATOR = "\n\n"
+CHUNK_WINDOW = 50  # Chunk sizes of text split at a time by iter_chunks()
+
+# Version of the chunk output; files processed with an older one are processed again
+PROCESSED_FORMAT_VERSION = 2  # 2: page numbers in chunk metadata
+
+# Processed files hold a header line and one compact JSON line per chunk,
+# optionally gzip-compressed. Files in the old indented JSON layout are
+# still read, and converted by sync_processed_files().
+PROCESSED_SUFFIX = ".jsonl"
+COMPRESSED_SUFFIX = ".jsonl.gz"
+LEGACY_SUFFIX = ".json"
+COMPRESS_PROCESSED_FILES = os.getenv("COMPRESS_PROCESSED_FILES", "0") == "1"
+GZIP_LEVEL = 6
+
+def iter_pdf_pages(pdf_path, start=0, stop=None):
+    """
+    Extract the text of a PDF file one page at a time.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        start (int): Index of the first page
+        stop (int): Index after the last page; defaults to the end of the document
+        
+    Yields:
+        tuple: (page number counted from 1, page text)
+    """
+    reader = PdfReader(pdf_path)
+    n_pages = len(reader.pages)
+    stop = n_pages if stop is None else min(stop, n_pages)
+    
+    for i in range(start, stop):
+        logger.debug(f"Processing page {i+1}/{n_pages}")
+        yield i + 1, reader.pages[i].extract_text() or ""
+
+def extract_page_texts(pdf_path, start=0, stop=None):
+    """
+    Extract the text of a range of pages from a PDF file.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        start (int): Index of the first page
+        stop (int): Index after the last page; defaults to the end of the document
+        
+    Returns:
+        list: Text of each page, in page order
+    """
+    return [text for _, text in iter_pdf_pages(pdf_path, start, stop)]
+
 def extract_text_from_pdf(pdf_path):
     """
     Extract text from a PDF file.
@@ -32,15 +97,7 @@ def extract_text_from_pdf(pdf_path):
     logger.info(f"Extracting text from {pdf_path}")
     
     try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        
-        # Extract text from each page
-        for i, page in enumerate(reader.pages):
-            logger.debug(f"Processing page {i+1}/{len(reader.pages)}")
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n\n"
+        text = "".join(text + PAGE_SEPARATOR for _, text in iter_pdf_pages(pdf_path) if text)
         
         logger.info(f"Successfully extracted {len(text)} characters from {pdf_path}")
         return text
@@ -49,6 +106,42 @@ def extract_text_from_pdf(pdf_path):
         logger.error(f"Error extracting text from {pdf_path}: {str(e)}")
         return ""
 
+# Extractor and pool for each supported raw file extension. Extracting
+# "process" formats is CPU-bound, so they run in the worker processes;
+# "thread" formats mostly wait on the disk and run in threads.
+RAW_FILE_FORMATS = {
+    ".pdf": (iter_pdf_pages, "process"),
+    ".docx": (iter_docx_sections, "process"),
+    ".csv": (iter_csv_rows, "thread"),
+    ".txt": (iter_text_sections, "thread"),
+    ".md": (iter_text_sections, "thread")
+}
+
+def is_supported_file(path):
+    """
+    Return True if path is a raw file in a supported format.
+    
+    Hidden files and Office lock files ("~$name.docx") are not documents.
+    """
+    name = Path(path).name
+    if name.startswith((".", "~$")):
+        return False
+    return Path(path).suffix.lower() in RAW_FILE_FORMATS
+
+def iter_file_pages(path):
+    """
+    Extract the text of a raw file in any supported format.
+    
+    Yields:
+        tuple: (page number counted from 1, or None for formats without pages, text)
+    """
+    extractor, _ = RAW_FILE_FORMATS[Path(path).suffix.lower()]
+    return extractor(path)
+
+def _make_text_splitter(chunk_size, chunk_overlap):
+    """Create the text splitter used for raw file chunks."""
+    return create_chunker(chunk_size, chunk_overlap, separators=["\n\n", "\n", " ", ""])
+
 def split_text_into_chunks(text, filename, chunk_size=1000, chunk_overlap=200):
     """
     Split text into smaller chunks for better processing.
@@ -65,16 +158,8 @@ def split_text_into_chunks(text, filename, chunk_size=1000, chunk_overlap=200):
     logger.info(f"Splitting text into chunks (size={chunk_size}, overlap={chunk_overlap})")
     
     try:
-        # Create text splitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        
         # Split text into chunks
-        chunks = text_splitter.split_text(text)
+        chunks = _make_text_splitter(chunk_size, chunk_overlap).split_text(text)
         
         # Create list of dictionaries with text and metadata
         result = []
@@ -95,130 +180,663 @@ def split_text_into_chunks(text, filename, chunk_size=1000, chunk_overlap=200):
         logger.error(f"Error splitting text: {str(e)}")
         return []
 
-def process_pdf_file(pdf_path):
+def _split_with_offsets(text_splitter, text):
+    """Split text and return (chunk, start offset) pairs."""
+    return [(text[start:end], start) for start, end in text_splitter.split_spans(text)]
+
+def _restart_point(text, chunks):
     """
-    Process a single PDF file and save the chunks.
+    Choose where to resume splitting a window of text.
+    
+    Returns the index of the first held-back chunk and the offset to resume
+    from: the start of the paragraph that chunk begins with, so splitting
+    from there reproduces it and every chunk after it. The last chunk is
+    always held back, since the next page can extend it.
     
-    Args:
-        pdf_path (Path): Path to the PDF file
-        
     Returns:
-        bool: True if processing was successful, False otherwise
+        tuple: (chunk index, text offset), or None if nothing can be emitted yet
     """
-    filename = pdf_path.name
-    output_path = PROCESSED_FILES_DIR / f"{filename}.json"
+    for i in range(len(chunks) - 2, 0, -1):
+        start = chunks[i][1]
+        
+        # The chunk must start right after a paragraph separator ("\n\n",
+        # the splitter's first separator). With several separators in the
+        # whitespace before it, the splitter produces whitespace-only
+        # paragraphs the chunk may or may not include, so skip those.
+        run_start = start
+        while run_start > 0 and text[run_start - 1].isspace():
+            run_start -= 1
+        
+        separator = text.find(PAGE_SEPARATOR, run_start, start)
+        if separator > 0 and text.find(PAGE_SEPARATOR, separator + len(PAGE_SEPARATOR), start) < 0:
+            # Splitting from the separator reproduces every chunk starting at
+            # this offset (a short chunk can be followed by a longer one with
+            # the same start), so hold them all back
+            while i > 0 and chunks[i - 1][1] == start:
+                i -= 1
+            if i > 0:
+                return i, separator
     
-    logger.info(f"Processing PDF: {filename}")
+    # No paragraph starts a chunk yet (e.g. one very long paragraph); keep reading
+    return None
+
+def iter_chunks(pages, chunk_size=1000, chunk_overlap=200):
+    """
+    Split a stream of pages into chunks as the pages arrive.
     
-    try:
-        # Extract text from PDF
-        text = extract_text_from_pdf(pdf_path)
+    Pages are joined as in extract_text_from_pdf and split CHUNK_WINDOW
+    chunk sizes of text at a time. The last chunks of each window are held
+    back and split again together with the following pages, so chunks
+    overlap across page boundaries just as when splitting the whole text
+    at once, while memory stays bounded by the window size.
+    
+    Args:
+        pages (iterable): (page number, text) pairs in page order
+        chunk_size (int): Size of each chunk
+        chunk_overlap (int): Overlap between chunks
         
+    Yields:
+        tuple: (chunk text, first page number, last page number)
+    """
+    text_splitter = _make_text_splitter(chunk_size, chunk_overlap)
+    window = CHUNK_WINDOW * chunk_size
+    
+    parts = []
+    size = 0
+    page_offsets = []  # Offset of each buffered page, for mapping chunks to pages
+    page_numbers = []
+    
+    def page_range(start, length):
+        first = page_numbers[bisect.bisect_right(page_offsets, start) - 1]
+        last = page_numbers[bisect.bisect_right(page_offsets, start + length - 1) - 1]
+        return first, last
+    
+    for page_number, text in pages:
         if not text:
-            logger.warning(f"No text extracted from {filename}")
-            return False
+            continue
         
-        # Split text into chunks
-        chunks = split_text_into_chunks(text, filename)
+        page_offsets.append(size)
+        page_numbers.append(page_number)
+        parts.append(text + PAGE_SEPARATOR)
+        size += len(text) + len(PAGE_SEPARATOR)
+        if size < window:
+            continue
+        
+        buffer = "".join(parts)
+        chunks = _split_with_offsets(text_splitter, buffer)
+        restart = _restart_point(buffer, chunks)
+        if restart is None:
+            parts = [buffer]
+            continue
         
-        if not chunks:
-            logger.warning(f"No chunks created for {filename}")
-            return False
+        held, offset = restart
+        for chunk, start in chunks[:held]:
+            yield (chunk,) + page_range(start, len(chunk))
         
-        # Save chunks to JSON file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(chunks, f, ensure_ascii=False, indent=2)
+        # Keep the unsplit tail and the pages it covers
+        first_page = bisect.bisect_right(page_offsets, offset) - 1
+        page_offsets = [max(0, o - offset) for o in page_offsets[first_page:]]
+        page_numbers = page_numbers[first_page:]
+        parts = [buffer[offset:]]
+        size = len(parts[0])
+    
+    if parts:
+        buffer = "".join(parts)
+        for chunk, start in _split_with_offsets(text_splitter, buffer):
+            yield (chunk,) + page_range(start, len(chunk))
+
+def processed_file_path(filename, output_dir=None):
+    """
+    Return the path to write a source file's processed chunks to.
+    
+    Args:
+        filename (str): Original filename
+        output_dir (Path): Directory for the processed file; defaults to PROCESSED_FILES_DIR
         
-        logger.info(f"Saved processed data to {output_path}")
-        return True
+    Returns:
+        Path: Path in the configured format (compressed or not)
+    """
+    suffix = COMPRESSED_SUFFIX if COMPRESS_PROCESSED_FILES else PROCESSED_SUFFIX
+    return Path(output_dir or PROCESSED_FILES_DIR) / f"{filename}{suffix}"
+
+def find_processed_file(filename, output_dir=None):
+    """
+    Return the existing processed file of a source file in any format.
+    
+    Returns:
+        Path: Path to the processed file, or None if the file was not processed
+    """
+    output_dir = Path(output_dir or PROCESSED_FILES_DIR)
+    for suffix in (PROCESSED_SUFFIX, COMPRESSED_SUFFIX, LEGACY_SUFFIX):
+        path = output_dir / f"{filename}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+def remove_processed_file(filename):
+    """
+    Delete the processed file of a source file and forget it in the manifest.
+    
+    Returns:
+        Path: The deleted processed file, or None if the file was not processed
+    """
+    manifest = Manifest(PROCESSED_FILES_DIR / MANIFEST_FILENAME)
+    manifest.forget(filename)
+    manifest.save()
+    
+    path = find_processed_file(filename)
+    if path is not None:
+        path.unlink()
+        logger.info(f"Deleted {path}")
+    return path
+
+def processed_source_name(path):
+    """Return the source filename a processed file belongs to."""
+    for suffix in (COMPRESSED_SUFFIX, PROCESSED_SUFFIX, LEGACY_SUFFIX):
+        if path.name.endswith(suffix):
+            return path.name[:-len(suffix)]
+    return None
+
+def write_chunks(chunks, filename, output_path):
+    """
+    Save chunks to a processed file as they are produced.
+    
+    Chunks are spilled to a temporary file first, because the header holds
+    the total number of chunks, which is only known at the end. The spilled
+    lines are then copied after the header and the file is replaced
+    atomically.
+    
+    Args:
+        chunks (iterable): (text, first page, last page) tuples from iter_chunks()
+        filename (str): Original filename (for metadata)
+        output_path (Path): Path of the file to write; gzip-compressed if it ends in .gz
+        
+    Returns:
+        int: Number of chunks written
+    """
+    output_path = Path(output_path)
+    spill_path = output_path.with_name(output_path.name + ".partial")
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    
+    try:
+        count = 0
+        with open(spill_path, 'w', encoding='utf-8') as f:
+            for text, first_page, last_page in chunks:
+                f.write(json.dumps([text, first_page, last_page], ensure_ascii=False) + "\n")
+                count += 1
+        
+        if not count:
+            return 0
+        
+        header = json.dumps({"version": 1, "source": filename, "total_chunks": count}, ensure_ascii=False) + "\n"
+        if output_path.suffix == ".gz":
+            out = gzip.open(tmp_path, 'wb', compresslevel=GZIP_LEVEL)
+        else:
+            out = open(tmp_path, 'wb')
+        with out, open(spill_path, 'rb') as spill:
+            out.write(header.encode('utf-8'))
+            shutil.copyfileobj(spill, out)
+        os.replace(tmp_path, output_path)
+        return count
+    
+    finally:
+        for path in (spill_path, tmp_path):
+            if path.exists():
+                path.unlink()
+
+def process_raw_file(path, chunk_size=1000, chunk_overlap=200, output_dir=None):
+    """
+    Process a single raw file (PDF, Word, CSV or text) and save the chunks.
+    
+    Pages (or, for other formats, sections) are extracted, chunked and
+    written out one at a time, so memory use does not grow with the size
+    of the document.
+    
+    Args:
+        path (Path): Path to the raw file
+        chunk_size (int): Size of each text chunk
+        chunk_overlap (int): Overlap between chunks
+        output_dir (Path): Directory for the processed file; defaults to PROCESSED_FILES_DIR
+        
+    Returns:
+        bool: True if processing was successful, False otherwise
+    """
+    filename = path.name
+    output_path = processed_file_path(filename, output_dir)
+    
+    logger.info(f"Processing {path.suffix.lower().lstrip('.').upper()} file: {filename}")
+    
+    try:
+        pages = iter_file_pages(path)
+        return _save_pages(pages, filename, output_path, chunk_size, chunk_overlap)
     
     except Exception as e:
         logger.error(f"Error processing {filename}: {str(e)}")
         return False
 
-def load_processed_documents():
+def _save_pages(pages, filename, output_path, chunk_size, chunk_overlap):
+    """Chunk a stream of pages into output_path; returns True if any chunks were saved."""
+    count = write_chunks(iter_chunks(pages, chunk_size, chunk_overlap), filename, output_path)
+    
+    if not count:
+        logger.warning(f"No text extracted from {filename}")
+        return False
+    
+    # Drop the output of an earlier run in another format
+    for suffix in (PROCESSED_SUFFIX, COMPRESSED_SUFFIX, LEGACY_SUFFIX):
+        stale_path = output_path.with_name(f"{filename}{suffix}")
+        if stale_path != output_path and stale_path.exists():
+            stale_path.unlink()
+    
+    logger.info(f"Saved {count} chunks to {output_path}")
+    return True
+
+def iter_processed_file(path):
     """
-    Load all processed documents from the processed_files directory.
+    Read the chunks of one processed file lazily.
+    
+    Args:
+        path (Path): Path to the processed file, in the line-delimited format
+                     (optionally gzip-compressed) or the old JSON layout
+        
+    Yields:
+        Document: One Document per chunk, in chunk order
+    """
+    from langchain.schema.document import Document
+    
+    path = Path(path)
+    
+    if path.name.endswith(LEGACY_SUFFIX):
+        with open(path, 'r', encoding='utf-8') as f:
+            chunks = json.load(f)
+        
+        logger.info(f"Loading {len(chunks)} chunks from {path}")
+        for chunk in chunks:
+            text = chunk.get('text', '')
+            if text:
+                yield Document(page_content=text, metadata=chunk.get('metadata', {}))
+        return
     
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        source = header["source"]
+        total_chunks = header["total_chunks"]
+        
+        logger.info(f"Loading {total_chunks} chunks from {path}")
+        for i, line in enumerate(f, 1):
+            text, first_page, last_page = json.loads(line)
+            metadata = {"source": source, "chunk": i, "total_chunks": total_chunks}
+            if first_page is not None:
+                metadata["page"] = first_page
+                metadata["page_end"] = last_page
+            yield Document(page_content=text, metadata=metadata)
+
+def load_processed_file(json_file):
+    """
+    Load the chunks of one processed file.
+    
+    Args:
+        json_file (Path): Path to the processed file
+        
     Returns:
         list: List of Document objects ready for indexing
     """
-    from langchain.schema.document import Document
+    return list(iter_processed_file(json_file))
+
+def processed_file_paths():
+    """
+    Return the processed file of every source, one per source.
+    
+    Returns:
+        list: Paths sorted by source filename
+    """
+    if not PROCESSED_FILES_DIR.exists():
+        return []
     
-    documents = []
+    # Prefer the current format if an old file was left behind
+    paths = {}
+    for path in sorted(PROCESSED_FILES_DIR.iterdir()):
+        source = processed_source_name(path)
+        if source is None or path.name == MANIFEST_FILENAME:
+            continue
+        if source not in paths or paths[source].name.endswith(LEGACY_SUFFIX):
+            paths[source] = path
+    return [paths[source] for source in sorted(paths)]
+
+def iter_processed_documents():
+    """
+    Read all processed documents lazily, one file at a time.
     
+    Yields:
+        Document: Document chunks ready for indexing
+    """
     if not PROCESSED_FILES_DIR.exists():
         logger.warning(f"Processed files directory not found: {PROCESSED_FILES_DIR}")
-        return documents
+        return
     
-    # Get all JSON files in the processed files directory
-    json_files = list(PROCESSED_FILES_DIR.glob("*.pdf.json"))
+    paths = processed_file_paths()
     
-    if not json_files:
-        logger.warning(f"No processed PDF files found in {PROCESSED_FILES_DIR}")
-        return documents
+    if not paths:
+        logger.warning(f"No processed files found in {PROCESSED_FILES_DIR}")
+        return
     
-    logger.info(f"Found {len(json_files)} processed PDF files")
+    logger.info(f"Found {len(paths)} processed files")
     
-    # Load each JSON file and convert to Document objects
-    for json_file in json_files:
+    for path in paths:
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                chunks = json.load(f)
-            
-            logger.info(f"Loading {len(chunks)} chunks from {json_file}")
-            
-            for chunk in chunks:
-                text = chunk.get('text', '')
-                metadata = chunk.get('metadata', {})
-                
-                if text:
-                    documents.append(Document(page_content=text, metadata=metadata))
+            yield from iter_processed_file(path)
         
         except Exception as e:
-            logger.error(f"Error loading {json_file}: {str(e)}")
+            logger.error(f"Error loading {path}: {str(e)}")
+
+def load_processed_documents():
+    """
+    Load all processed documents from the processed_files directory.
     
+    Returns:
+        list: List of Document objects ready for indexing
+    """
+    documents = list(iter_processed_documents())
     logger.info(f"Loaded {len(documents)} document chunks in total")
     return documents
 
-def process_all_pdfs(chunk_size=1000, chunk_overlap=200):
+def migrate_processed_files(manifest=None):
     """
-    Process all PDF files in the raw_files directory.
+    Convert processed files in the old indented JSON layout to the current format.
+    
+    Args:
+        manifest (Manifest): Manifest whose output names are updated, if given
+        
+    Returns:
+        int: Number of files converted
+    """
+    converted = 0
+    for path in processed_file_paths():
+        if not path.name.endswith(LEGACY_SUFFIX):
+            continue
+        
+        source = processed_source_name(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                chunks = json.load(f)
+            
+            output_path = processed_file_path(source)
+            write_chunks(
+                ((chunk['text'], chunk.get('metadata', {}).get('page'), chunk.get('metadata', {}).get('page_end'))
+                 for chunk in chunks if chunk.get('text')),
+                source, output_path
+            )
+            path.unlink()
+        except Exception as e:
+            logger.error(f"Error converting {path}: {str(e)}")
+            continue
+        
+        if manifest is not None and source in manifest.entries:
+            manifest.entries[source]["output"] = output_path.name
+            manifest.changed()
+        
+        logger.info(f"Converted {path} to {output_path}")
+        converted += 1
+    
+    return converted
+
+def _page_ranges(pdf_path):
+    """
+    Split a large PDF into page ranges that are extracted in parallel.
+    
+    Returns:
+        list: (start, stop) page ranges, or None to process the file whole
+    """
+    try:
+        n_pages = len(PdfReader(pdf_path).pages)
+    except Exception:
+        return None  # Let the worker report the error
+    
+    if n_pages < PDF_SPLIT_MIN_PAGES:
+        return None
+    return [(start, min(start + PDF_PAGES_PER_TASK, n_pages)) for start in range(0, n_pages, PDF_PAGES_PER_TASK)]
+
+def _iter_page_ranges(pool, pdf_path, ranges, max_pending):
+    """Extract page ranges in the pool, yielding (page number, text) in page order."""
+    pending = deque()
+    for start, stop in ranges:
+        pending.append((start, pool.submit(extract_page_texts, pdf_path, start, stop)))
+        if len(pending) >= max_pending:
+            start, future = pending.popleft()
+            yield from enumerate(future.result(), start + 1)
+    while pending:
+        start, future = pending.popleft()
+        yield from enumerate(future.result(), start + 1)
+
+def _make_pool(workers):
+    """Create a process pool for raw file extraction."""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _iter_processed_in_pool(paths, chunk_size, chunk_overlap, workers):
+    """
+    Extract and chunk raw files, in a pool of worker processes if workers > 1.
+    
+    Small files are processed whole by one worker. Large PDFs are extracted
+    in page ranges by several workers and chunked in this process as the
+    ranges arrive in page order, so the output is the same as sequential
+    processing.
+    
+    Yields:
+        tuple: (path, True if processing was successful) as each file is done
+    """
+    page_ranges = {}
+    if workers > 1:
+        page_ranges = {path: _page_ranges(path) if path.suffix.lower() == ".pdf" else None for path in paths}
+    n_tasks = sum(len(ranges) if ranges else 1 for ranges in page_ranges.values())
+    workers = min(workers, n_tasks)
+    
+    # Not worth starting a pool for one task
+    if workers <= 1:
+        for path in paths:
+            yield path, process_raw_file(path, chunk_size, chunk_overlap)
+        return
+    
+    logger.info(f"Processing {len(paths)} files in {n_tasks} tasks with {workers} worker processes")
+    
+    crashed = []
+    with _make_pool(workers) as pool:
+        futures = {}
+        for path, ranges in page_ranges.items():
+            if not ranges:
+                futures[pool.submit(process_raw_file, path, chunk_size, chunk_overlap, PROCESSED_FILES_DIR)] = path
+        
+        # Chunk the pages of split PDFs while the workers extract them
+        for path, ranges in page_ranges.items():
+            if not ranges:
+                continue
+            
+            output_path = processed_file_path(path.name)
+            pages = _iter_page_ranges(pool, path, ranges, 2 * workers)
+            try:
+                ok = _save_pages(pages, path.name, output_path, chunk_size, chunk_overlap)
+            except BrokenProcessPool:
+                crashed.append(path)
+                continue
+            except Exception as e:
+                logger.error(f"Error processing {path.name}: {str(e)}")
+                ok = False
+            yield path, ok
+        
+        for future, path in futures.items():
+            try:
+                ok = future.result()
+            except BrokenProcessPool:
+                crashed.append(path)
+                continue
+            except Exception as e:
+                logger.error(f"Error processing {path.name}: {str(e)}")
+                ok = False
+            yield path, ok
+    
+    # A worker that dies (e.g. on a malformed PDF) breaks the whole pool;
+    # retry the affected files one at a time so only the culprit fails
+    for path in sorted(crashed):
+        logger.warning(f"Worker process died; retrying {path.name} on its own")
+        try:
+            with _make_pool(1) as pool:
+                ok = pool.submit(
+                    process_raw_file, path, chunk_size, chunk_overlap, PROCESSED_FILES_DIR
+                ).result()
+        except BrokenProcessPool:
+            logger.error(f"Worker process died while processing {path.name}")
+            ok = False
+        yield path, ok
+
+def _iter_processed_files(paths, chunk_size, chunk_overlap, workers):
+    """
+    Extract and chunk raw files of any supported format.
+    
+    Formats that are CPU-bound to extract go to the process pool (see
+    _iter_processed_in_pool); the others are processed meanwhile by up to
+    RAW_FILE_THREADS threads in this process.
+    
+    Yields:
+        tuple: (path, True if processing was successful) as each file is done
+    """
+    in_threads = [path for path in paths if RAW_FILE_FORMATS[path.suffix.lower()][1] == "thread"]
+    in_processes = [path for path in paths if path not in in_threads]
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(RAW_FILE_THREADS, len(in_threads)))) as threads:
+        futures = [(path, threads.submit(process_raw_file, path, chunk_size, chunk_overlap)) for path in in_threads]
+        
+        yield from _iter_processed_in_pool(in_processes, chunk_size, chunk_overlap, workers)
+        
+        for path, future in futures:
+            yield path, future.result()
+
+def sync_processed_files(chunk_size=1000, chunk_overlap=200, workers=None, force=False,
+                         on_processed=None, manifest=None, names=None):
+    """
+    Bring the processed files up to date with the raw_files directory.
+    
+    Only files that are new, changed, or were processed with different
+    chunk params are extracted and chunked; the manifest in the processed
+    files directory records the state of each processed file. Processed
+    output of files removed from raw_files is deleted. Every format in
+    RAW_FILE_FORMATS is processed; other files are ignored.
     
     Args:
         chunk_size (int): Size of each text chunk
         chunk_overlap (int): Overlap between chunks
+        workers (int): Worker processes; defaults to PDF_WORKERS (the number of cores)
+        force (bool): Re-process every file, even unchanged ones
+        on_processed (callable): Called with each file name as soon as the
+                                 file has been processed successfully
+        manifest (Manifest): Manifest to update; it is then left to the
+                             caller to save. By default the manifest in
+                             the processed files directory is loaded and
+                             saved.
+        names (iterable): Only check these raw file names, e.g. the files
+                          reported changed by a watcher; by default the
+                          whole raw_files directory is checked
         
     Returns:
-        tuple: (total, successful) counts
+        dict: File names by outcome, under "processed", "unchanged", "failed" and "removed"
     """
     # Ensure directories exist
     PROCESSED_FILES_DIR.mkdir(parents=True, exist_ok=True)
     
-    logger.info(f"Processing all PDFs in {RAW_FILES_DIR}")
+    save_manifest = manifest is None
+    if manifest is None:
+        manifest = Manifest(PROCESSED_FILES_DIR / MANIFEST_FILENAME)
+    params = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "format": PROCESSED_FORMAT_VERSION}
+    if CHUNK_TOKEN_ENCODING:
+        params["token_encoding"] = CHUNK_TOKEN_ENCODING  # Sizes are in tokens, not characters
+    
+    # Convert files written in the old JSON layout
+    migrate_processed_files(manifest)
+    
+    # Get the supported raw files, in a stable order
+    if names is None:
+        raw_files = sorted(path for path in RAW_FILES_DIR.glob("*") if path.is_file() and is_supported_file(path))
+        removed = manifest.removed(path.name for path in raw_files)
+    else:
+        candidates = [RAW_FILES_DIR / name for name in sorted(set(names))]
+        raw_files = [path for path in candidates if path.is_file() and is_supported_file(path)]
+        removed = [path.name for path in candidates if path.name in manifest.entries and not path.is_file()]
     
-    total_count = 0
-    success_count = 0
+    # Drop the output of files that were removed from raw_files
+    for name in removed:
+        output_path = PROCESSED_FILES_DIR / manifest.forget(name)["output"]
+        if output_path.exists():
+            output_path.unlink()
+        logger.info(f"{name} was removed from {RAW_FILES_DIR}; deleted {output_path}")
     
-    # Get all PDF files
-    pdf_files = [f for f in RAW_FILES_DIR.glob("*.pdf")]
+    pending = []
+    unchanged = []
+    for path in raw_files:
+        if not force and manifest.is_current(path.name, path, params):
+            unchanged.append(path.name)
+        else:
+            pending.append(path)
+    
+    processed = []
+    failed = []
+    if pending:
+        logger.info(f"Processing {len(pending)} new or changed files ({len(unchanged)} unchanged)")
+        
+        # Fingerprint before processing, so a file modified meanwhile is processed again next time
+        fingerprints = {path.name: file_fingerprint(path) for path in pending}
+        
+        for path, ok in _iter_processed_files(pending, chunk_size, chunk_overlap, workers or PDF_WORKERS):
+            if ok:
+                manifest.record(path.name, fingerprints[path.name], params, processed_file_path(path.name).name)
+                processed.append(path.name)
+                if on_processed is not None:
+                    on_processed(path.name)
+            else:
+                failed.append(path.name)
     
-    if not pdf_files:
-        logger.warning(f"No PDF files found in {RAW_FILES_DIR}")
-        return 0, 0
+    if save_manifest:
+        manifest.save()
+    
+    if failed:
+        logger.warning(f"Failed to process: {', '.join(failed)}")
+    
+    logger.info(
+        f"Processed files are up to date: {len(processed)} processed, {len(unchanged)} unchanged, "
+        f"{len(failed)} failed, {len(removed)} removed"
+    )
+    return {"processed": sorted(processed), "unchanged": unchanged, "failed": sorted(failed), "removed": removed}
+
+def process_all_pdfs(chunk_size=1000, chunk_overlap=200, workers=None, force=False):
+    """
+    Process all supported files (PDF, Word, CSV and text) in the raw_files directory.
+    
+    Files that have not changed since they were last processed with the
+    same chunk params are skipped (see sync_processed_files). With more
+    than one worker, files (and page ranges of very large files) are
+    extracted and chunked in parallel processes. A file that fails does not
+    affect the others, and the output is the same as with one worker.
+    
+    Args:
+        chunk_size (int): Size of each text chunk
+        chunk_overlap (int): Overlap between chunks
+        workers (int): Worker processes; defaults to PDF_WORKERS (the number of cores)
+        force (bool): Re-process every file, even unchanged ones
+        
+    Returns:
+        tuple: (total, successful) counts; unchanged files count as successful
+    """
+    logger.info(f"Processing all files in {RAW_FILES_DIR}")
     
-    logger.info(f"Found {len(pdf_files)} PDF files to process")
+    changes = sync_processed_files(chunk_size, chunk_overlap, workers, force)
     
-    # Process each PDF file
-    for pdf_path in pdf_files:
-        total_count += 1
-        if process_pdf_file(pdf_path):
-            success_count += 1
+    total_count = len(changes["processed"]) + len(changes["unchanged"]) + len(changes["failed"])
+    if not total_count:
+        logger.warning(f"No supported files found in {RAW_FILES_DIR}")
     
-    logger.info(f"Processed {success_count}/{total_count} PDF files successfully")
+    success_count = total_count - len(changes["failed"])
+    logger.info(f"Processed {success_count}/{total_count} files successfully")
     return total_count, success_count
 
 if __name__ == "__main__":
-    logger.info("Starting PDF processing")
-    total, successful = process_all_pdfs()
-    logger.info(f"PDF processing complete. Processed {successful}/{total} files successfully")
\ No newline at end of file
+    logger.info("Starting raw file processing")
+    total, successful = process_all_pdfs(force="--force" in sys.argv[1:])
+    logger.info(f"Processing complete. Processed {successful}/{total} files successfully")
\ No newline at end of file
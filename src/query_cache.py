@@ -0,0 +1,84 @@
+"""
+Bounded LRU cache with optional expiry
+
+Used by the retriever to skip the embedding forward pass and the FAISS
+search for questions that have been asked recently.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with a size bound and optional TTL.
+
+    Hit and miss counters are kept so cache effectiveness can be monitored.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """
+        Create an empty cache.
+
+        Args:
+            maxsize (int): Maximum number of entries; 0 disables the cache
+            ttl (float): Seconds an entry stays valid, or None for no expiry
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries."""
+        if self.maxsize <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry; the hit and miss counters are kept."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        Return cache statistics.
+
+        Returns:
+            dict: size, maxsize, ttl, hits, misses and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
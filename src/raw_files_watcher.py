@@ -0,0 +1,264 @@
+"""
+Raw files watcher
+
+Long-running process that keeps the index in step with data/raw_files.
+File events are collected until the directory has been quiet for
+WATCH_DEBOUNCE_SECONDS (or WATCH_MAX_DELAY_SECONDS have passed since the
+first one), and then only the affected files are processed and indexed
+through the ingest pipeline. Each batch is published as a new index
+version, which serving workers pick up through their index watcher.
+
+Events come from watchdog (inotify on Linux) when it is installed, and
+otherwise from polling the directory every WATCH_POLL_INTERVAL seconds.
+
+Run one watcher per index, next to the web server:
+    python src/raw_files_watcher.py
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+# Add the project root directory to the Python path when run directly
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ingest_pipeline import ingest_raw_files
+from src.process_pdfs import RAW_FILES_DIR, is_supported_file
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Watcher settings
+WATCH_BACKENDS = ("auto", "inotify", "polling")
+WATCH_BACKEND = os.getenv("WATCH_BACKEND", "auto")
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2"))
+WATCH_MAX_DELAY_SECONDS = float(os.getenv("WATCH_MAX_DELAY_SECONDS", "30"))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "1"))
+WATCH_RETRY_SECONDS = float(os.getenv("WATCH_RETRY_SECONDS", "30"))
+
+class PollingSource(threading.Thread):
+    """Reports files whose size or modification time changed between directory scans."""
+
+    def __init__(self, directory, notify, interval=WATCH_POLL_INTERVAL):
+        super().__init__(name="raw-files-poller", daemon=True)
+        self.directory = directory
+        self.notify = notify
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        """Return name -> (size, mtime_ns) for the files in the directory."""
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                    except FileNotFoundError:
+                        pass  # Removed while scanning
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            snapshot = self._scan()
+            changed = {
+                name for name in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(name) != self._snapshot.get(name)
+            }
+            self._snapshot = snapshot
+            for name in changed:
+                self.notify(name)
+
+    def stop(self):
+        """Stop polling after the current scan."""
+        self._stop_event.set()
+
+class InotifySource:
+    """Reports file events from watchdog's native observer (inotify on Linux)."""
+
+    def __init__(self, directory, notify):
+        # Optional dependency; RawFilesWatcher falls back to polling without it
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (event.src_path, getattr(event, "dest_path", None)):
+                    if path and os.path.dirname(os.path.abspath(path)) == directory:
+                        notify(os.path.basename(path))
+
+        directory = os.path.abspath(directory)
+        self._observer = Observer()
+        self._observer.schedule(Handler(), directory, recursive=False)
+
+    def start(self):
+        self._observer.start()
+
+    def stop(self):
+        self._observer.stop()
+
+    def join(self, timeout=None):
+        self._observer.join(timeout)
+
+class RawFilesWatcher:
+    """
+    Debounces raw file events and ingests the affected files in batches.
+
+    notify() may be called from any thread; run() does the ingesting on
+    the calling thread until stop() is called.
+    """
+
+    def __init__(self, directory=RAW_FILES_DIR, backend=WATCH_BACKEND, debounce=WATCH_DEBOUNCE_SECONDS,
+                 max_delay=WATCH_MAX_DELAY_SECONDS, poll_interval=WATCH_POLL_INTERVAL, ingest=ingest_raw_files):
+        """
+        Args:
+            directory (Path): Directory to watch
+            backend (str): One of WATCH_BACKENDS; "auto" uses inotify if watchdog is installed
+            debounce (float): Seconds without events before a batch is ingested
+            max_delay (float): Most seconds a batch waits while events keep arriving
+            poll_interval (float): Seconds between scans when polling
+            ingest (callable): Called with names= the affected file names
+        """
+        if backend not in WATCH_BACKENDS:
+            raise ValueError(f"Unknown watch backend '{backend}', expected one of {WATCH_BACKENDS}")
+
+        self.directory = directory
+        self.backend = backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.ingest = ingest
+
+        self._pending = set()
+        self._first_event = None
+        self._last_event = None
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._source = None
+
+    def notify(self, name):
+        """Record an event for a file in the watched directory."""
+        if not is_supported_file(name):
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            self._pending.add(name)
+            self._last_event = now
+            if self._first_event is None:
+                self._first_event = now
+            self._cond.notify()
+
+    def _start_source(self):
+        """Start delivering file events, preferring inotify."""
+        if self.backend != "polling":
+            try:
+                self._source = InotifySource(self.directory, self.notify)
+                self._source.start()
+                logger.info(f"Watching {self.directory} for file events (watchdog)")
+                return
+            except ImportError:
+                if self.backend == "inotify":
+                    raise
+                logger.info("watchdog is not installed; falling back to polling")
+
+        self._source = PollingSource(self.directory, self.notify, self.poll_interval)
+        self._source.start()
+        logger.info(f"Watching {self.directory} by polling every {self.poll_interval}s")
+
+    def _next_batch(self):
+        """
+        Wait until a batch of events is due.
+
+        Returns:
+            set: Affected file names, or None once stopping
+        """
+        with self._cond:
+            while not self._stopping:
+                if self._pending:
+                    now = time.monotonic()
+                    due = min(self._last_event + self.debounce, self._first_event + self.max_delay)
+                    if now >= due:
+                        batch = self._pending
+                        self._pending = set()
+                        self._first_event = self._last_event = None
+                        return batch
+                    self._cond.wait(due - now)
+                else:
+                    self._cond.wait()
+            return None
+
+    def _ingest(self, names):
+        """Ingest one batch; on failure, retry it with the next batch after a delay."""
+        logger.info(f"Ingesting {len(names)} changed files: {', '.join(sorted(names))}")
+        try:
+            changes = self.ingest(names=names)
+        except Exception as e:
+            logger.error(f"Error ingesting changed files, retrying in {WATCH_RETRY_SECONDS}s: {str(e)}")
+            with self._cond:
+                now = time.monotonic()
+                self._pending |= set(names)
+                self._last_event = max(self._last_event or now, now + WATCH_RETRY_SECONDS - self.debounce)
+                self._first_event = self._first_event or now
+            return
+
+        if changes and changes.get("failed"):
+            logger.warning(f"Could not process: {', '.join(changes['failed'])}")
+
+    def run(self):
+        """Catch up with changes made while not running, then ingest batches of events until stopped."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._start_source()
+
+        try:
+            # Files may have changed while the watcher was not running
+            try:
+                self.ingest()
+            except Exception as e:
+                logger.error(f"Error ingesting raw files on startup: {str(e)}")
+
+            while True:
+                names = self._next_batch()
+                if names is None:
+                    break
+                self._ingest(names)
+        finally:
+            self._source.stop()
+            self._source.join()
+
+    def stop(self):
+        """Ask run() to return once the current batch is done."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Watch data/raw_files and keep the index up to date")
+    parser.add_argument("--backend", choices=WATCH_BACKENDS, default=WATCH_BACKEND, help="How to detect file changes")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECONDS,
+                        help="Seconds without file events before changes are ingested")
+    args = parser.parse_args(argv)
+
+    watcher = RawFilesWatcher(backend=args.backend, debounce=args.debounce)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("Stopping raw files watcher")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
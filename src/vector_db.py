@@ -1,16 +1,32 @@
 import os
 import sys
+import json
+import fcntl
 import logging
-import pickle
+import argparse
+import shutil
+import threading
+import uuid
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
 
 # Add the project root directory to the Python path when run directly
 if __name__ == "__main__":
     sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
 
+from src.bm25 import reciprocal_rank_fusion
+from src.docstore import DOCSTORE_FILENAME, SQLiteDocstore, compute_chunk_hash
+from src.embeddings import EMBEDDINGS_BACKEND, EMBEDDINGS_MODEL, embed_texts, get_embeddings
+from src.query_cache import LRUCache
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -18,95 +34,1542 @@ logger = logging.getLogger(__name__)
 
 # FAISS index settings
 FAISS_INDEX_PATH = "data/faiss_index"
-EMBEDDINGS_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
-def get_embeddings():
-    """Initialize HuggingFace embeddings model."""
+# Index versioning settings. Each save goes to FAISS_INDEX_PATH/versions/<version>
+# and CURRENT_VERSION_FILE names the version that readers should use.
+INDEX_VERSIONS_DIR = "versions"
+CURRENT_VERSION_FILE = "CURRENT"
+WRITE_LOCK_FILE = ".write.lock"
+INDEX_VERSIONS_TO_KEEP = int(os.getenv("INDEX_VERSIONS_TO_KEEP", "3"))
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "5"))
+LEGACY_INDEX_VERSION = "legacy"
+INDEX_META_FILENAME = "index_meta.json"
+
+# Index type settings. "flat" is exact search; the others are approximate
+# indexes that trade a little recall for much lower query latency or memory.
+# "sq_fp16" and "sq_int8" store scalar-quantized vectors at 1/2 and 1/4 of
+# the float32 size.
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq_fp16", "sq_int8")
+SCALAR_QUANTIZER_TYPES = {
+    "sq_fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq_int8": faiss.ScalarQuantizer.QT_8bit
+}
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+DEFAULT_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0 = choose from corpus size
+DEFAULT_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+IVF_TRAIN_SAMPLE_SIZE = int(os.getenv("FAISS_IVF_TRAIN_SAMPLE_SIZE", "50000"))
+PQ_M = int(os.getenv("FAISS_PQ_M", "48"))
+PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+
+# Exact re-ranking for scalar-quantized indexes. When enabled at build time
+# a float32 copy of the vectors is saved next to each shard and memory-mapped;
+# the top k * RERANK_FACTOR quantized hits are re-scored against it.
+SQ_RERANK = os.getenv("FAISS_SQ_RERANK", "0") == "1"
+RERANK_FACTOR = int(os.getenv("FAISS_RERANK_FACTOR", "4"))
+
+# Sharding settings. "none" keeps every vector in one index, "source" gives
+# each source document its own shard and "size" appends to the newest shard
+# until it holds SHARD_MAX_VECTORS vectors. Shards are searched in parallel.
+SHARD_STRATEGIES = ("none", "source", "size")
+SHARD_BY = os.getenv("FAISS_SHARD_BY", "none")
+SHARD_MAX_VECTORS = int(os.getenv("FAISS_SHARD_MAX_VECTORS", "100000"))
+SHARD_SEARCH_THREADS = int(os.getenv("FAISS_SHARD_SEARCH_THREADS", str(min(8, os.cpu_count() or 1))))
+SHARDS_DIR = "shards"
+
+# Retrieval settings. "hybrid" fuses BM25 and dense rankings with reciprocal
+# rank fusion and answers strong keyword matches from BM25 alone.
+RETRIEVAL_MODES = ("dense", "hybrid")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+LEXICAL_FAST_PATH_COVERAGE = float(os.getenv("LEXICAL_FAST_PATH_COVERAGE", "0.9"))  # >1 disables
+LEXICAL_FAST_PATH_MARGIN = float(os.getenv("LEXICAL_FAST_PATH_MARGIN", "1.5"))
+
+# Filtered search settings. Source filters of up to FILTER_EXACT_MAX_IDS chunks
+# are searched exactly over just those vectors.
+FILTER_EXACT_MAX_IDS = int(os.getenv("FILTER_EXACT_MAX_IDS", "20000"))
+SOURCE_FILTER_CACHE_SIZE = 256
+
+# Query cache settings (QUERY_CACHE_TTL in seconds, 0 = no expiry)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+# Thread pool for parallel shard searches, created on first use
+_shard_pool = None
+_shard_pool_lock = threading.Lock()
+
+def get_current_index_version(index_root=FAISS_INDEX_PATH):
+    """
+    Return the name of the index version readers should currently use.
+    
+    Args:
+        index_root (str): Root directory of the FAISS index
+        
+    Returns:
+        str: Version name, LEGACY_INDEX_VERSION for an unversioned index
+             saved directly in index_root, or None if no index exists
+    """
+    current_file = os.path.join(index_root, CURRENT_VERSION_FILE)
+    
     try:
-        return HuggingFaceEmbeddings(
-            model_name=EMBEDDINGS_MODEL
-        )
-    except Exception as e:
-        logger.error(f"Error initializing embeddings model: {str(e)}")
+        with open(current_file, 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+        if version:
+            return version
+    except FileNotFoundError:
+        pass
+    
+    # Fall back to an index written by save_local directly into index_root
+    if os.path.exists(os.path.join(index_root, "index.faiss")):
+        return LEGACY_INDEX_VERSION
+    
+    return None
+
+def get_index_version_path(version, index_root=FAISS_INDEX_PATH):
+    """Return the directory holding the given index version."""
+    if version == LEGACY_INDEX_VERSION:
+        return index_root
+    return os.path.join(index_root, INDEX_VERSIONS_DIR, version)
+
+@contextmanager
+def index_write_lock(index_root=FAISS_INDEX_PATH):
+    """
+    Hold the exclusive lock for modifying the index.
+    
+    Writers hold it from loading the current version until they have
+    published their new one, so a writer in another process (or thread)
+    cannot publish in between and have its changes silently dropped. The
+    lock is a flock() on a file in index_root and is released if the
+    process dies. It is not reentrant.
+    
+    Args:
+        index_root (str): Root directory of the FAISS index
+    """
+    os.makedirs(index_root, exist_ok=True)
+    with open(os.path.join(index_root, WRITE_LOCK_FILE), 'a', encoding='utf-8') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def save_index_version(db, index_root=FAISS_INDEX_PATH):
+    """
+    Save a FAISS store as a new index version and atomically make it current.
+    
+    The store is written to a temporary directory which is renamed into place
+    once complete, and the CURRENT pointer is then replaced in a single
+    os.replace(), so readers never see a partially written index. A store
+    loaded from the current version should be saved while still holding
+    index_write_lock().
+    
+    Args:
+        db (VectorStore): Vector store to save
+        index_root (str): Root directory of the FAISS index
+        
+    Returns:
+        str: Name of the newly published version
+    """
+    versions_dir = os.path.join(index_root, INDEX_VERSIONS_DIR)
+    os.makedirs(versions_dir, exist_ok=True)
+    
+    # Sortable, unique version name
+    version = f"v{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+    tmp_path = os.path.join(versions_dir, f".tmp-{version}")
+    
+    try:
+        db.save(tmp_path)
+        os.rename(tmp_path, os.path.join(versions_dir, version))
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
         raise
+    
+    # Atomically point readers at the new version
+    current_file = os.path.join(index_root, CURRENT_VERSION_FILE)
+    tmp_current = f"{current_file}.tmp-{version}"
+    with open(tmp_current, 'w', encoding='utf-8') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_current, current_file)
+    
+    logger.info(f"Published FAISS index version {version}")
+    prune_index_versions(index_root)
+    return version
+
+def prune_index_versions(index_root=FAISS_INDEX_PATH, keep=INDEX_VERSIONS_TO_KEEP):
+    """
+    Delete old index versions, keeping the newest ones and the current one.
+    
+    Args:
+        index_root (str): Root directory of the FAISS index
+        keep (int): Number of most recent versions to keep
+    """
+    versions_dir = os.path.join(index_root, INDEX_VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return
+    
+    current = get_current_index_version(index_root)
+    versions = sorted(
+        name for name in os.listdir(versions_dir) if not name.startswith(".")
+    )
+    
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version == current:
+            continue
+        try:
+            shutil.rmtree(os.path.join(versions_dir, version))
+            logger.info(f"Removed old FAISS index version {version}")
+        except Exception as e:
+            logger.error(f"Error removing index version {version}: {str(e)}")
+
+def _training_sample(vectors):
+    """Return a reproducible random sample of at most IVF_TRAIN_SAMPLE_SIZE vectors."""
+    n = len(vectors)
+    if n <= IVF_TRAIN_SAMPLE_SIZE:
+        return vectors
+    return vectors[np.random.default_rng(0).choice(n, IVF_TRAIN_SAMPLE_SIZE, replace=False)]
+
+def build_faiss_index(vectors, index_type=FAISS_INDEX_TYPE, ids=None):
+    """
+    Build and populate a raw FAISS index of the requested type.
+    
+    IVF indexes are trained on a random sample of the vectors. Corpora that
+    are too small to train the requested index fall back to a simpler type.
+    Flat and HNSW indexes are wrapped in an IndexIDMap2 so that every index
+    type is addressed by the same stable vector ids as the docstore.
+    
+    Args:
+        vectors (np.ndarray): float32 array of shape (n, dim)
+        index_type (str): One of INDEX_TYPES
+        ids (np.ndarray): int64 vector ids; defaults to 0..n-1
+        
+    Returns:
+        tuple: (faiss.Index, index type actually built)
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {INDEX_TYPES}")
+    
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    ids = np.arange(n, dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+    
+    if index_type.startswith("ivf"):
+        nlist = IVF_NLIST or int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+        
+        # Product quantization needs at least 2**nbits training points per centroid
+        if index_type == "ivf_pq" and (n < 2 ** PQ_NBITS or dim % PQ_M != 0):
+            logger.warning(f"Cannot train IVF-PQ (n={n}, dim={dim}, m={PQ_M}); using ivf_flat instead")
+            index_type = "ivf_flat"
+        if n < 2 * nlist or nlist < 2:
+            logger.warning(f"Too few vectors ({n}) to train an IVF index; using flat instead")
+            index_type = "flat"
+    
+    if index_type == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    elif index_type in SCALAR_QUANTIZER_TYPES:
+        # int8 learns per-dimension ranges from the vectors; fp16 needs none
+        base = faiss.IndexScalarQuantizer(dim, SCALAR_QUANTIZER_TYPES[index_type], faiss.METRIC_L2)
+        base.train(_training_sample(vectors))
+        index = faiss.IndexIDMap2(base)
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, HNSW_M)
+        base.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        base.hnsw.efSearch = DEFAULT_EF_SEARCH
+        index = faiss.IndexIDMap2(base)
+    else:
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, PQ_NBITS)
+        index.nprobe = DEFAULT_NPROBE
+        
+        # Train on a sample of the corpus
+        sample = _training_sample(vectors)
+        logger.info(f"Training {index_type} index (nlist={nlist}) on {len(sample)} vectors")
+        index.train(sample)
+    
+    index.add_with_ids(vectors, ids)
+    logger.info(f"Built {index_type} FAISS index with {index.ntotal} vectors")
+    return index, index_type
+
+def _base_index(index):
+    """Return the index wrapped by an IndexIDMap, or the index itself."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def make_search_params(index, nprobe=None, ef_search=None, selector=None):
+    """
+    Build per-query FAISS search parameters for the given index.
+    
+    Passing parameters per call (rather than setting them on the shared
+    index) keeps concurrent searches with different settings independent.
+    
+    Args:
+        index (faiss.Index): Index being searched
+        nprobe (int): Number of IVF lists to visit
+        ef_search (int): HNSW search beam width
+        selector (faiss.IDSelector): Restrict results to these vector ids
+        
+    Returns:
+        faiss.SearchParameters: Parameters, or None for unfiltered exact search
+    """
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe or DEFAULT_NPROBE)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search or DEFAULT_EF_SEARCH)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+def _unique_chunks(documents):
+    """
+    Drop chunks that repeat an earlier chunk's content hash.
+    
+    Args:
+        documents (list): List of document chunks
+        
+    Returns:
+        tuple: (unique documents, their chunk hashes)
+    """
+    unique_docs = []
+    hashes = []
+    seen = set()
+    
+    for doc in documents:
+        chunk_hash = compute_chunk_hash(doc)
+        if chunk_hash in seen:
+            continue
+        seen.add(chunk_hash)
+        unique_docs.append(doc)
+        hashes.append(chunk_hash)
+    
+    return unique_docs, hashes
+
+def _is_strong_lexical_match(hits, k):
+    """
+    Decide whether BM25 hits are decisive enough to skip dense retrieval.
+    
+    There must be at least k hits, so the answer is as long as a dense one,
+    and the best hit must contain (by IDF weight) nearly every query term
+    and clearly outscore the runner-up.
+    """
+    if not hits or len(hits) < k:
+        return False
+    
+    _, top_score, coverage = hits[0]
+    if coverage < LEXICAL_FAST_PATH_COVERAGE:
+        return False
+    
+    return len(hits) == 1 or top_score >= LEXICAL_FAST_PATH_MARGIN * hits[1][1]
+
+def _mmap_flag(index_type):
+    """Return the FAISS IO flag that memory-maps the given index type."""
+    if index_type.startswith("ivf"):
+        # Inverted lists are mapped directly from the file
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # Flat codes (also used as HNSW storage) are mapped in place
+    return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+def _get_shard_pool():
+    """Return the thread pool used to search shards in parallel."""
+    global _shard_pool
+    
+    if _shard_pool is None:
+        with _shard_pool_lock:
+            if _shard_pool is None:
+                _shard_pool = ThreadPoolExecutor(
+                    max_workers=max(1, SHARD_SEARCH_THREADS), thread_name_prefix="faiss-shard"
+                )
+    return _shard_pool
+
+def _merge_shard_results(results, k):
+    """
+    Merge per-shard search results into a global top-k per query.
+    
+    Args:
+        results (list): (distances, ids) array pairs, one per shard, each
+                        sorted by ascending distance within a query row
+        k (int): Number of hits to keep per query
+        
+    Returns:
+        list: One list of vector ids per query, nearest first
+    """
+    merged = []
+    for q in range(len(results[0][0])):
+        rows = [
+            [(d, i) for d, i in zip(distances[q], ids[q]) if i != -1]
+            for distances, ids in results
+        ]
+        merged.append([int(i) for _, i in islice(heapq.merge(*rows), k)])
+    return merged
+
+class Shard:
+    """
+    One FAISS index holding part of a VectorStore's vectors.
+    
+    Shards loaded from disk stay memory-mapped until they are first
+    modified. path is the file the shard was loaded from and is cleared on
+    modification, so an unchanged shard can be hard-linked into the next
+    index version instead of being rewritten.
+    
+    Scalar-quantized shards may also carry full-precision vectors, aligned
+    with the index's storage order, that are used to re-rank candidates.
+    """
+    
+    def __init__(self, name, index, index_type, key=None, path=None, mapped=False,
+                 vectors=None, vectors_path=None):
+        self.name = name
+        self.index = index
+        self.index_type = index_type
+        self.key = key
+        self.path = path
+        self.mapped = mapped
+        self.vectors = vectors
+        self.vectors_path = vectors_path
+        self._ids = None
+        self._order = None
+        self._direct_map_lock = threading.Lock()
+    
+    @classmethod
+    def load(cls, name, path, index_type, key=None, vectors_path=None):
+        """Memory-map a saved shard, reading it into memory if mapping fails."""
+        try:
+            index = faiss.read_index(path, _mmap_flag(index_type))
+            mapped = True
+        except RuntimeError as e:
+            logger.warning(f"Could not memory-map {path}, reading into memory: {str(e)}")
+            index = faiss.read_index(path)
+            mapped = False
+        
+        vectors = np.load(vectors_path, mmap_mode='r') if vectors_path else None
+        return cls(name, index, index_type, key, path, mapped, vectors, vectors_path)
+    
+    @property
+    def ntotal(self):
+        """Number of vectors in the shard."""
+        return self.index.ntotal
+    
+    def ids(self):
+        """
+        Return the sorted vector ids held by this shard.
+        
+        Returns:
+            np.ndarray: int64 ids, or None if they cannot be listed
+        """
+        if self._ids is None:
+            base = _base_index(self.index)
+            if isinstance(self.index, faiss.IndexIDMap):
+                ids = faiss.vector_to_array(self.index.id_map)
+            elif isinstance(base, faiss.IndexIVF):
+                invlists = base.invlists
+                ids = np.concatenate([np.empty(0, dtype=np.int64)] + [
+                    faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+                    for l in range(base.nlist) if invlists.list_size(l)
+                ])
+            else:
+                return None
+            ids = ids.astype(np.int64)
+            self._order = np.argsort(ids, kind="stable")
+            self._ids = ids[self._order]
+        return self._ids
+    
+    def held(self, ids):
+        """Return the subset of the sorted ids that this shard holds."""
+        shard_ids = self.ids()
+        if shard_ids is None or shard_ids.size == 0:
+            return ids if shard_ids is None else shard_ids
+        
+        pos = np.minimum(np.searchsorted(shard_ids, ids), shard_ids.size - 1)
+        return ids[shard_ids[pos] == ids]
+    
+    def _vectors_for(self, ids):
+        """Return the stored vectors for ids, at full precision when available."""
+        if self.vectors is None:
+            return self.index.reconstruct_batch(ids)
+        
+        # Storage rows of an ID-mapped index follow the order of its id map
+        shard_ids = self.ids()
+        rows = self._order[np.searchsorted(shard_ids, ids)]
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+    
+    def _can_reconstruct(self):
+        """
+        Return True if vectors can be looked up by id.
+        
+        IVF indexes get an id -> list entry hashtable the first time; it is
+        dropped again before the shard is modified (see _modify).
+        """
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return True
+        
+        base = _base_index(self.index)
+        if not isinstance(base, faiss.IndexIVF):
+            return False
+        with self._direct_map_lock:
+            if base.direct_map.type == faiss.DirectMap.NoMap:
+                base.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return True
+    
+    def _modify(self):
+        """Prepare the shard for modification, unmapping it if necessary."""
+        if self.mapped:
+            self.index = faiss.read_index(self.path)
+            self.mapped = False
+        
+        # IVF removal by IDSelectorBatch does not work with a hashtable direct map
+        base = _base_index(self.index)
+        if isinstance(base, faiss.IndexIVF) and base.direct_map.type != faiss.DirectMap.NoMap:
+            base.set_direct_map_type(faiss.DirectMap.NoMap)
+        if self.vectors is not None:
+            self.vectors = np.array(self.vectors, dtype=np.float32)
+        self.path = None
+        self.vectors_path = None
+        self._ids = None
+        self._order = None
+    
+    def add(self, vectors, ids):
+        """Append vectors with the given ids."""
+        self._modify()
+        self.index.add_with_ids(vectors, ids)
+        if self.vectors is not None:
+            self.vectors = np.vstack([self.vectors, vectors])
+    
+    def remove(self, ids):
+        """
+        Remove vectors by id.
+        
+        Flat and IVF indexes delete the ids in place. HNSW graphs do not
+        support deletion, so the remaining vectors are re-inserted into a
+        fresh graph; no chunk is re-embedded either way.
+        
+        Returns:
+            int: Number of vectors removed
+        """
+        self._modify()
+        
+        base = _base_index(self.index)
+        if not isinstance(base, faiss.IndexHNSW):
+            if self.vectors is not None:
+                # remove_ids compacts the index storage in order; do the same
+                self.vectors = self.vectors[~np.isin(faiss.vector_to_array(self.index.id_map), ids)]
+            return int(self.index.remove_ids(faiss.IDSelectorBatch(ids)))
+        
+        n = base.ntotal
+        vectors = base.reconstruct_n(0, n)
+        existing_ids = faiss.vector_to_array(self.index.id_map)
+        keep = ~np.isin(existing_ids, ids)
+        
+        logger.info(f"Rebuilding {self.index_type} shard {self.name} without {n - keep.sum()} vectors")
+        self.index, self.index_type = build_faiss_index(vectors[keep], self.index_type, existing_ids[keep])
+        return int(n - keep.sum())
+    
+    def search(self, vectors, k, nprobe=None, ef_search=None, allowed_ids=None):
+        """
+        Search the shard.
+        
+        When allowed_ids is given the search is restricted to those ids. Small
+        selections are scored exactly against just their own vectors; larger
+        ones use a FAISS ID selector, so the cost follows the size of the
+        selection rather than over-fetching global results. IVF indexes then
+        visit every list, since the selected ids can be in any of them, and
+        HNSW widens its beam the smaller the selection's share of the index.
+        
+        Shards with full-precision vectors fetch k * RERANK_FACTOR quantized
+        candidates and re-rank them exactly.
+        
+        Returns:
+            tuple: (distances, ids) arrays of shape (n_queries, k)
+        """
+        selector = None
+        
+        if allowed_ids is not None:
+            if len(allowed_ids) <= FILTER_EXACT_MAX_IDS and self._can_reconstruct():
+                return self._exact_search(vectors, allowed_ids, k)
+            selector = faiss.IDSelectorBatch(allowed_ids)
+            
+            base = _base_index(self.index)
+            if isinstance(base, faiss.IndexIVF):
+                nprobe = base.nlist
+            elif isinstance(base, faiss.IndexHNSW):
+                # Excluded ids still take up the beam; widen it by the share of ids excluded
+                ef_search = max(ef_search or DEFAULT_EF_SEARCH,
+                                2 * k * -(-self.ntotal // max(1, len(allowed_ids))))
+        
+        params = make_search_params(self.index, nprobe, ef_search, selector)
+        fetch = k * RERANK_FACTOR if self.vectors is not None else k
+        
+        if params is None:
+            distances, ids = self.index.search(vectors, fetch)
+        else:
+            distances, ids = self.index.search(vectors, fetch, params=params)
+        
+        if self.vectors is not None:
+            return self._rerank(vectors, ids, k)
+        return distances, ids
+    
+    def _exact_search(self, vectors, allowed_ids, k):
+        """Exact L2 search over only the vectors with the given ids."""
+        candidates = self._vectors_for(allowed_ids)
+        distances = (
+            (vectors ** 2).sum(axis=1)[:, None]
+            - 2 * vectors @ candidates.T
+            + (candidates ** 2).sum(axis=1)[None, :]
+        )
+        
+        k = min(k, len(allowed_ids))
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(vectors))[:, None]
+        order = np.argsort(distances[rows, top], axis=1, kind="stable")
+        top = top[rows, order]
+        return distances[rows, top], allowed_ids[top]
+    
+    def _rerank(self, vectors, candidate_ids, k):
+        """Re-score candidate ids against full-precision vectors and keep the top k."""
+        distances = np.full((len(vectors), k), np.inf, dtype=np.float32)
+        ids = np.full((len(vectors), k), -1, dtype=np.int64)
+        
+        for q, (query, row) in enumerate(zip(vectors, candidate_ids)):
+            row = row[row != -1]
+            if row.size == 0:
+                continue
+            exact = ((self._vectors_for(row) - query) ** 2).sum(axis=1)
+            top = np.argsort(exact, kind="stable")[:k]
+            distances[q, :top.size] = exact[top]
+            ids[q, :top.size] = row[top]
+        
+        return distances, ids
+    
+    def save(self, path):
+        """
+        Write the shard to path, hard-linking the loaded files if unchanged.
+        
+        Full-precision vectors, if any, are written next to it as .npy.
+        
+        Returns:
+            bool: True if the files were linked rather than rewritten
+        """
+        vectors_path = path[:-len(".faiss")] + ".vectors.npy"
+        
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                os.link(self.path, path)
+                if self.vectors_path is not None:
+                    os.link(self.vectors_path, vectors_path)
+                return True
+            except OSError:
+                for created in (path, vectors_path):
+                    if os.path.exists(created):
+                        os.remove(created)
+        
+        faiss.write_index(self.index, path)
+        if self.vectors is not None:
+            np.save(vectors_path, np.asarray(self.vectors, dtype=np.float32))
+        return False
+    
+    def describe(self):
+        """Return the shard's entry for index_meta.json."""
+        entry = {
+            "name": self.name,
+            "file": f"{SHARDS_DIR}/{self.name}.faiss",
+            "index_type": self.index_type,
+            "key": self.key,
+            "ntotal": self.ntotal
+        }
+        if self.vectors is not None:
+            entry["vectors_file"] = f"{SHARDS_DIR}/{self.name}.vectors.npy"
+        return entry
+
+class VectorStore:
+    """
+    FAISS vectors paired with an on-disk SQLite docstore.
+    
+    FAISS vector ids are the docstore row ids, so a search reads chunk text
+    and metadata only for its top-k hits. The vectors are split into shards
+    according to shard_by, and shards are searched in parallel. Stores loaded
+    for serving have their vectors memory-mapped and their docstore opened
+    read-only; writers load a private, writable docstore copy and publish it
+    with save_index_version().
+    """
+    
+    def __init__(self, shards, docstore, embeddings, index_type=FAISS_INDEX_TYPE, shard_by=SHARD_BY):
+        if shard_by not in SHARD_STRATEGIES:
+            raise ValueError(f"Unknown shard strategy '{shard_by}', expected one of {SHARD_STRATEGIES}")
+        
+        self.shards = list(shards)
+        self.docstore = docstore
+        self.embeddings = embeddings
+        self.index_type = index_type
+        self.shard_by = shard_by
+        
+        # Source -> vector id lookups for filtered search; only cached when
+        # the store is read-only and so cannot change underneath the cache
+        self._source_ids_cache = LRUCache(SOURCE_FILTER_CACHE_SIZE) if docstore.read_only else None
+    
+    @property
+    def ntotal(self):
+        """Number of vectors in the index."""
+        return sum(shard.ntotal for shard in self.shards)
+    
+    @classmethod
+    def from_documents(cls, documents, embeddings, index_type=FAISS_INDEX_TYPE, shard_by=SHARD_BY):
+        """
+        Embed documents and build a new writable store.
+        
+        Args:
+            documents (list): List of document chunks
+            embeddings: LangChain embeddings model
+            index_type (str): One of INDEX_TYPES
+            shard_by (str): One of SHARD_STRATEGIES
+            
+        Returns:
+            VectorStore: New store backed by a scratch docstore
+        """
+        documents, hashes = _unique_chunks(documents)
+        vectors = embed_texts([doc.page_content for doc in documents], embeddings)
+        
+        store = cls([], SQLiteDocstore.scratch(), embeddings, index_type, shard_by)
+        store.add_embedded([(documents, hashes, vectors)])
+        return store
+    
+    @classmethod
+    def load(cls, path, embeddings, writable=False):
+        """
+        Load a saved store.
+        
+        Shards are memory-mapped either way; a writable store reads a shard
+        into memory only when it is modified.
+        
+        Args:
+            path (str): Directory containing the saved store
+            embeddings: LangChain embeddings model
+            writable (bool): Load a private docstore copy that can be
+                             modified, instead of opening it read-only
+            
+        Returns:
+            VectorStore: Loaded store
+        """
+        docstore_path = os.path.join(path, DOCSTORE_FILENAME)
+        if not os.path.exists(docstore_path):
+            return cls._load_legacy(path, embeddings)
+        
+        with open(os.path.join(path, INDEX_META_FILENAME), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        index_type = meta.get("index_type", "flat")
+        shard_by = meta.get("shard_by", "none")
+        
+        # Versions saved before sharding hold a single index.faiss; an
+        # index whose sources were all removed has no shards at all
+        if "shards" in meta:
+            shard_entries = meta["shards"]
+        else:
+            shard_entries = [{"name": "shard-00000", "file": "index.faiss", "index_type": index_type}]
+        shards = [
+            Shard.load(entry["name"], os.path.join(path, entry["file"]),
+                       entry.get("index_type", index_type), entry.get("key"),
+                       os.path.join(path, entry["vectors_file"]) if entry.get("vectors_file") else None)
+            for entry in shard_entries
+        ]
+        
+        if writable:
+            docstore = SQLiteDocstore.scratch(docstore_path)
+        else:
+            docstore = SQLiteDocstore(docstore_path, read_only=True)
+        
+        return cls(shards, docstore, embeddings, index_type, shard_by)
+    
+    @classmethod
+    def _load_legacy(cls, path, embeddings):
+        """
+        Load an index saved by LangChain's FAISS.save_local (index.pkl).
+        
+        The pickled docstore is converted into an in-memory SQLite docstore
+        and the flat index is re-keyed by position, so the next save writes
+        the new on-disk format. Old indexes often hold the same chunks
+        several times (the whole corpus used to be re-added on every run);
+        only the first copy of each chunk and its vector are kept.
+        """
+        logger.info(f"Converting legacy pickled FAISS index at {path}")
+        db = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        
+        documents = [db.docstore.search(db.index_to_docstore_id[i]) for i in range(db.index.ntotal)]
+        unique_docs, hashes = _unique_chunks(documents)
+        
+        # Positions of the kept chunks; _unique_chunks keeps first copies in order
+        positions = []
+        for position, doc in enumerate(documents):
+            if len(positions) < len(unique_docs) and doc is unique_docs[len(positions)]:
+                positions.append(position)
+        if len(unique_docs) < len(documents):
+            logger.info(f"Dropped {len(documents) - len(unique_docs)} duplicate chunks from the legacy index")
+        
+        ids = np.arange(len(unique_docs), dtype=np.int64)
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(db.index.d))
+        if positions:
+            index.add_with_ids(db.index.reconstruct_n(0, db.index.ntotal)[positions], ids)
+        
+        docstore = SQLiteDocstore(":memory:")
+        docstore.add(ids, unique_docs, hashes)
+        return cls([Shard("shard-00000", index, "flat")], docstore, embeddings, "flat", "none")
+    
+    def save(self, path):
+        """
+        Write the shards, docstore and metadata into the directory path.
+        
+        Shards that have not changed since they were loaded are hard-linked
+        from the version they were loaded from.
+        
+        Args:
+            path (str): Destination directory
+        """
+        os.makedirs(os.path.join(path, SHARDS_DIR), exist_ok=True)
+        
+        linked = 0
+        for shard in self.shards:
+            linked += shard.save(os.path.join(path, SHARDS_DIR, f"{shard.name}.faiss"))
+        logger.info(f"Saved {len(self.shards)} shards ({linked} unchanged shards linked)")
+        
+        self.docstore.save(os.path.join(path, DOCSTORE_FILENAME))
+        
+        meta = {
+            "index_type": self.index_type,
+            "dimension": self.shards[0].index.d if self.shards else None,
+            "ntotal": self.ntotal,
+            "embeddings_model": EMBEDDINGS_MODEL,
+            "embeddings_backend": EMBEDDINGS_BACKEND,
+            "shard_by": self.shard_by,
+            "shards": [shard.describe() for shard in self.shards]
+        }
+        with open(os.path.join(path, INDEX_META_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+    
+    def add_documents(self, documents):
+        """
+        Embed documents and append them to the index and docstore.
+        
+        Chunks whose content hash is already in the docstore are skipped
+        without being embedded, so re-integrating a corpus only pays for
+        the chunks that are actually new. Only the shards that receive new
+        vectors are modified.
+        
+        Args:
+            documents (list): List of document chunks
+            
+        Returns:
+            list: Vector ids assigned to the newly added documents
+        """
+        documents, hashes = self.new_chunks(documents)
+        if not documents:
+            return []
+        
+        vectors = embed_texts([doc.page_content for doc in documents], self.embeddings)
+        return self.add_embedded([(documents, hashes, vectors)])
+    
+    def new_chunks(self, documents):
+        """
+        Drop repeated chunks and chunks that are already indexed.
+        
+        Args:
+            documents (list): List of document chunks
+            
+        Returns:
+            tuple: (documents, chunk hashes) that still need to be added
+        """
+        documents, hashes = _unique_chunks(documents)
+        
+        known = self.docstore.find_hashes(hashes)
+        if known:
+            new = [(doc, h) for doc, h in zip(documents, hashes) if h not in known]
+            documents = [doc for doc, _ in new]
+            hashes = [h for _, h in new]
+            logger.info(f"Skipping {len(known)} chunks that are already indexed")
+        
+        return documents, hashes
+    
+    def add_embedded(self, batches):
+        """
+        Append documents that were already embedded.
+        
+        Each batch is written to the docstore as it arrives, so only the
+        vectors are held until the end. They are then added to the shards
+        in one go, which lets new IVF/PQ/SQ shards be trained on all of
+        them rather than on the first batch.
+        
+        Args:
+            batches (iterable): (documents, chunk hashes, vectors) tuples
+            
+        Returns:
+            list: Vector ids assigned to the added documents
+        """
+        sources, vectors, ids = [], [], []
+        for documents, hashes, batch_vectors in batches:
+            if not documents:
+                continue
+            start = self.docstore.next_id()
+            batch_ids = np.arange(start, start + len(documents), dtype=np.int64)
+            self.docstore.add(batch_ids, documents, hashes)
+            
+            sources.extend(doc.metadata.get('source', 'Unknown') for doc in documents)
+            vectors.append(np.asarray(batch_vectors, dtype=np.float32))
+            ids.append(batch_ids)
+        
+        if not ids:
+            return []
+        
+        ids = np.concatenate(ids)
+        self._add_to_shards(sources, np.vstack(vectors), ids)
+        return ids.tolist()
+    
+    def _shard_batches(self, sources):
+        """
+        Split new vectors into batches bound for one shard each.
+        
+        Args:
+            sources (list): Source file of each new vector
+            
+        Returns:
+            list: (Shard or None, shard key, row indices) tuples; a None shard
+                  means a new shard is built for the batch
+        """
+        n = len(sources)
+        
+        if self.shard_by == "source":
+            rows_by_source = {}
+            for row, source in enumerate(sources):
+                rows_by_source.setdefault(source, []).append(row)
+            existing = {shard.key: shard for shard in self.shards if shard.key is not None}
+            return [(existing.get(source), source, rows) for source, rows in rows_by_source.items()]
+        
+        if self.shard_by == "size":
+            batches = []
+            start = 0
+            last = self.shards[-1] if self.shards else None
+            if last is not None and last.ntotal < SHARD_MAX_VECTORS:
+                start = min(SHARD_MAX_VECTORS - last.ntotal, n)
+                batches.append((last, None, list(range(start))))
+            for begin in range(start, n, SHARD_MAX_VECTORS):
+                batches.append((None, None, list(range(begin, min(begin + SHARD_MAX_VECTORS, n)))))
+            return batches
+        
+        return [(self.shards[0] if self.shards else None, None, list(range(n)))]
+    
+    def _add_to_shards(self, sources, vectors, ids):
+        """Append vectors to their shards, building new shards as needed."""
+        for shard, key, rows in self._shard_batches(sources):
+            if not rows:
+                continue
+            
+            rows = np.asarray(rows)
+            if shard is None:
+                index, index_type = build_faiss_index(vectors[rows], self.index_type, ids[rows])
+                # Keep full-precision vectors for re-ranking quantized shards
+                full = vectors[rows] if SQ_RERANK and index_type in SCALAR_QUANTIZER_TYPES else None
+                self.shards.append(Shard(self._next_shard_name(), index, index_type, key, vectors=full))
+            else:
+                shard.add(vectors[rows], ids[rows])
+    
+    def _next_shard_name(self):
+        """Return an unused shard name."""
+        names = {shard.name for shard in self.shards}
+        number = len(self.shards)
+        while f"shard-{number:05d}" in names:
+            number += 1
+        return f"shard-{number:05d}"
+    
+    def remove_ids(self, ids):
+        """
+        Remove vectors and their docstore rows.
+        
+        Shards left empty are dropped; the others delete the ids in place.
+        
+        Args:
+            ids (list): Integer vector ids to remove
+            
+        Returns:
+            int: Number of vectors removed from the index
+        """
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        if ids.size == 0:
+            return 0
+        
+        removed = 0
+        for shard in list(self.shards):
+            held = shard.held(ids)
+            if held.size == 0:
+                continue
+            if held.size == shard.ntotal and shard.ids() is not None:
+                logger.info(f"Dropping emptied shard {shard.name}")
+                self.shards.remove(shard)
+                removed += int(held.size)
+            else:
+                removed += shard.remove(held)
+        
+        self.docstore.delete(ids.tolist())
+        return removed
+    
+    def similarity_search(self, query, k=5, nprobe=None, ef_search=None, mode=None, sources=None):
+        """
+        Similarity search with tunable approximate-search parameters.
+        
+        Args:
+            query (str): The user's question or message
+            k (int): Number of documents to retrieve
+            nprobe (int): Number of IVF lists to visit
+            ef_search (int): HNSW search beam width
+            mode (str): "dense" or "hybrid"; defaults to RETRIEVAL_MODE
+            sources (list): Only return chunks from these source files
+            
+        Returns:
+            list: List of relevant document chunks
+        """
+        return self.similarity_search_batch([query], k, nprobe, ef_search, mode, sources=sources)[0]
+    
+    def similarity_search_batch(self, queries, k=5, nprobe=None, ef_search=None, mode=None,
+                                embed=None, sources=None):
+        """
+        Similarity search for many queries at once.
+        
+        All queries that need a dense search are embedded in a single model
+        call and searched with a single FAISS matrix search, which is much
+        cheaper per query than calling similarity_search() in a loop.
+        
+        In hybrid mode each query is also ranked with BM25 over the inverted
+        index. Queries with a strong keyword match are answered from the
+        lexical ranking alone, without embedding; the rest merge the lexical
+        and dense rankings with reciprocal rank fusion.
+        
+        Args:
+            queries (list): Questions to search for
+            k (int): Number of documents to retrieve per query
+            nprobe (int): Number of IVF lists to visit
+            ef_search (int): HNSW search beam width
+            mode (str): "dense" or "hybrid"; defaults to RETRIEVAL_MODE
+            embed (callable): Maps a list of queries to a float32 array of
+                              vectors; defaults to the store's embeddings
+            sources (list): Only return chunks from these source files
+            
+        Returns:
+            list: One list of relevant document chunks per query
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        
+        mode = mode or RETRIEVAL_MODE
+        embed = embed or self.embed_queries
+        
+        allowed_ids = None
+        if sources is not None:
+            allowed_ids = self.ids_for_sources(sources)
+            if allowed_ids.size == 0:
+                return [[] for _ in queries]
+        
+        if mode == "dense":
+            return self._documents_for(self._dense_ids(embed(queries), k, nprobe, ef_search, allowed_ids))
+        if mode != "hybrid":
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        
+        candidates = max(k, HYBRID_CANDIDATES)
+        lexical = [self.docstore.bm25_search(query, candidates, sources) for query in queries]
+        
+        ranked = [None] * len(queries)
+        needs_dense = []
+        for i, hits in enumerate(lexical):
+            if _is_strong_lexical_match(hits, k):
+                ranked[i] = [hit[0] for hit in hits[:k]]
+            else:
+                needs_dense.append(i)
+        
+        if needs_dense:
+            logger.debug(f"Lexical fast path answered {len(queries) - len(needs_dense)}/{len(queries)} queries")
+            vectors = embed([queries[i] for i in needs_dense])
+            dense = self._dense_ids(vectors, candidates, nprobe, ef_search, allowed_ids)
+            for i, dense_ids in zip(needs_dense, dense):
+                lexical_ids = [hit[0] for hit in lexical[i]]
+                ranked[i] = reciprocal_rank_fusion([dense_ids, lexical_ids], RRF_K)[:k]
+        
+        return self._documents_for(ranked)
+    
+    def embed_queries(self, queries):
+        """
+        Embed queries with the store's embeddings model.
+        
+        Args:
+            queries (list): Query strings
+            
+        Returns:
+            np.ndarray: float32 array of shape (len(queries), dim)
+        """
+        if len(queries) == 1:
+            return np.asarray([self.embeddings.embed_query(queries[0])], dtype=np.float32)
+        return np.asarray(self.embeddings.embed_documents(list(queries)), dtype=np.float32)
+    
+    def ids_for_sources(self, sources):
+        """
+        Return the sorted vector ids of every chunk from the given sources.
+        
+        Args:
+            sources (list): Source file names, as stored in chunk metadata
+            
+        Returns:
+            np.ndarray: int64 vector ids
+        """
+        key = tuple(sorted(set(sources)))
+        
+        if self._source_ids_cache is not None:
+            cached = self._source_ids_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        ids = np.asarray(sorted(self.docstore.ids_for_sources(key)), dtype=np.int64)
+        
+        if self._source_ids_cache is not None:
+            self._source_ids_cache.put(key, ids)
+        return ids
+    
+    def _dense_ids(self, vectors, k, nprobe=None, ef_search=None, allowed_ids=None):
+        """
+        Return the FAISS hits for each query vector as lists of ids.
+        
+        Every shard is searched for its own top k, in parallel when there are
+        several, and the per-shard results are merged with a heap. When
+        allowed_ids is given, shards holding none of them are skipped and the
+        rest search only their share of the selection.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        
+        tasks = []
+        for shard in self.shards:
+            shard_allowed = allowed_ids
+            if allowed_ids is not None and len(self.shards) > 1:
+                shard_allowed = shard.held(allowed_ids)
+                if shard_allowed.size == 0:
+                    continue
+            tasks.append((shard, shard_allowed))
+        
+        if not tasks:
+            return [[] for _ in range(len(vectors))]
+        
+        if len(tasks) == 1:
+            results = [tasks[0][0].search(vectors, k, nprobe, ef_search, tasks[0][1])]
+        else:
+            results = list(_get_shard_pool().map(
+                lambda task: task[0].search(vectors, k, nprobe, ef_search, task[1]), tasks
+            ))
+        
+        return _merge_shard_results(results, k)
+    
+    def _documents_for(self, id_lists):
+        """Resolve lists of vector ids to documents with one docstore lookup."""
+        by_id = self.docstore.get_by_ids(i for ids in id_lists for i in ids)
+        return [[by_id[i] for i in ids if i in by_id] for ids in id_lists]
+    
+    def close(self):
+        """Release the docstore connection."""
+        self.docstore.close()
 
-def create_faiss_index(documents):
+def create_faiss_index(documents, index_type=FAISS_INDEX_TYPE):
     """
     Create a FAISS index from the provided documents.
     
     Args:
         documents (list): List of document chunks
+        index_type (str): One of INDEX_TYPES
         
     Returns:
-        FAISS: FAISS vector store
+        VectorStore: The new vector store
     """
+    with index_write_lock():
+        return _create_faiss_index(documents, index_type)
+
+def _create_faiss_index(documents, index_type=FAISS_INDEX_TYPE):
+    """Create and publish a FAISS index; the caller holds index_write_lock()."""
     try:
         # Get embeddings
         embeddings = get_embeddings()
         
         # Create FAISS index
-        db = FAISS.from_documents(documents, embeddings)
+        db = VectorStore.from_documents(documents, embeddings, index_type)
         
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(FAISS_INDEX_PATH), exist_ok=True)
+        # Save the index as a new version
+        version = save_index_version(db)
+        invalidate_retriever()
         
-        # Save the index
-        db.save_local(FAISS_INDEX_PATH)
-        
-        logger.info(f"FAISS index created and saved to {FAISS_INDEX_PATH}")
+        logger.info(f"FAISS index created and saved to {FAISS_INDEX_PATH} (version {version})")
         return db
     
     except Exception as e:
         logger.error(f"Error creating FAISS index: {str(e)}")
         raise
 
-def load_faiss_index():
+def load_faiss_index(index_path=None, writable=False):
     """
-    Load the FAISS index.
+    Load the FAISS index from disk.
+    
+    This always reads a fresh copy; request handlers should go through
+    get_retriever() instead so the index is loaded only once per process.
     
+    Args:
+        index_path (str): Directory containing the saved index. Defaults to
+                          the current version under FAISS_INDEX_PATH.
+        writable (bool): Load a modifiable copy instead of memory-mapping it
+        
     Returns:
-        FAISS: FAISS vector store or None if not found
+        VectorStore: Vector store or None if not found
     """
     try:
+        if index_path is None:
+            version = get_current_index_version()
+            if version is not None:
+                index_path = get_index_version_path(version)
+        
         # Check if index exists
-        if not os.path.exists(FAISS_INDEX_PATH):
-            logger.warning(f"FAISS index not found at {FAISS_INDEX_PATH}")
+        if index_path is None or not os.path.exists(index_path):
+            logger.warning(f"FAISS index not found at {index_path or FAISS_INDEX_PATH}")
             return None
         
         # Get embeddings
         embeddings = get_embeddings()
         
-        # Load index with allow_dangerous_deserialization=True to fix the security error
-        db = FAISS.load_local(FAISS_INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
+        db = VectorStore.load(index_path, embeddings, writable=writable)
         
-        logger.info(f"FAISS index loaded from {FAISS_INDEX_PATH}")
+        logger.info(f"FAISS index loaded from {index_path} ({db.ntotal} vectors)")
         return db
     
     except Exception as e:
         logger.error(f"Error loading FAISS index: {str(e)}")
         return None
 
-def get_relevant_documents(query, top_k=5):
+class ReadWriteLock:
+    """
+    Lock that allows many concurrent readers or a single writer.
+    
+    Waiting writers take priority over new readers so that an index swap
+    is not starved by a steady stream of searches.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def read(self):
+        """Hold the lock in shared mode for the duration of the block."""
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively for the duration of the block."""
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+class Retriever:
+    """
+    Process-wide, thread-safe holder for the loaded FAISS index.
+    
+    The index is loaded on first use and then shared by every request. When a
+    new index version is published, reload_if_changed() loads it alongside the
+    old one and swaps it in under the write lock, so in-flight searches finish
+    on the old version and later searches use the new one.
+    """
+    
+    def __init__(self, index_root=FAISS_INDEX_PATH):
+        self.index_root = index_root
+        self._db = None
+        self._version = None
+        self._rwlock = ReadWriteLock()
+        self._load_lock = threading.Lock()
+        
+        # Query vectors depend only on the model; results depend on the index
+        # version and are cleared whenever a new version is swapped in
+        self._vector_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+        self._result_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+    
+    @property
+    def version(self):
+        """Name of the index version currently held in memory."""
+        return self._version
+    
+    def _load_version(self, version):
+        """Load the given version from disk without touching the resident index."""
+        if version is None:
+            return None
+        return load_faiss_index(get_index_version_path(version, self.index_root))
+    
+    def _swap(self, db, version):
+        """Replace the resident index once in-flight searches have finished."""
+        with self._rwlock.write():
+            self._db = db
+            self._version = version
+            self._result_cache.clear()
+    
+    def get_db(self):
+        """
+        Return the resident FAISS store, loading it if necessary.
+        
+        Returns:
+            FAISS: FAISS vector store or None if no index is available
+        """
+        db = self._db
+        if db is not None:
+            return db
+        
+        with self._load_lock:
+            # Another thread may have loaded it while we were waiting
+            if self._db is None:
+                version = get_current_index_version(self.index_root)
+                db = self._load_version(version)
+                if db is not None:
+                    self._swap(db, version)
+            return self._db
+    
+    def reload_if_changed(self):
+        """
+        Swap in the current on-disk index version if it differs from ours.
+        
+        Returns:
+            bool: True if a new version was loaded
+        """
+        version = get_current_index_version(self.index_root)
+        if version is None or version == self._version:
+            return False
+        
+        with self._load_lock:
+            if version == self._version:
+                return False
+            
+            # Load the new version outside the write lock so searches keep running
+            db = self._load_version(version)
+            if db is None:
+                logger.error(f"Could not load index version {version}; keeping {self._version}")
+                return False
+            
+            old_version = self._version
+            self._swap(db, version)
+        
+        logger.info(f"Swapped FAISS index version {old_version} -> {version}")
+        return True
+    
+    def invalidate(self):
+        """Drop the resident index so the next search reloads it from disk."""
+        with self._load_lock:
+            self._swap(None, None)
+        logger.info("Retriever invalidated; index will be reloaded on next use")
+    
+    def search(self, query, top_k=5, nprobe=None, ef_search=None, mode=None, sources=None):
+        """
+        Run a similarity search against the resident index.
+        
+        Args:
+            query (str): The user's question or message
+            top_k (int): Number of documents to retrieve
+            nprobe (int): Number of IVF lists to visit (IVF indexes only)
+            ef_search (int): HNSW search beam width (HNSW indexes only)
+            mode (str): "dense" or "hybrid"; defaults to RETRIEVAL_MODE
+            sources (list): Only return chunks from these source files
+            
+        Returns:
+            list: List of relevant document chunks
+        """
+        return self.search_batch([query], top_k, nprobe, ef_search, mode, sources)[0]
+    
+    def search_batch(self, queries, top_k=5, nprobe=None, ef_search=None, mode=None, sources=None):
+        """
+        Run similarity searches for many queries against the resident index.
+        
+        Results and query vectors are served from the LRU caches when
+        possible; only the remaining queries are embedded (in one batch)
+        and searched.
+        
+        Args:
+            queries (list): Questions to search for
+            top_k (int): Number of documents to retrieve per query
+            nprobe (int): Number of IVF lists to visit (IVF indexes only)
+            ef_search (int): HNSW search beam width (HNSW indexes only)
+            mode (str): "dense" or "hybrid"; defaults to RETRIEVAL_MODE
+            sources (list): Only return chunks from these source files
+            
+        Returns:
+            list: One list of relevant document chunks per query
+        """
+        if self.get_db() is None:
+            logger.warning("No FAISS index available. Returning empty results.")
+            return [[] for _ in queries]
+        
+        with self._rwlock.read():
+            db = self._db
+            if db is None:
+                return [[] for _ in queries]
+            
+            mode = mode or RETRIEVAL_MODE
+            results = [None] * len(queries)
+            source_key = tuple(sorted(set(sources))) if sources is not None else None
+            keys = [
+                (self._version, query, top_k, nprobe, ef_search, mode, source_key)
+                for query in queries
+            ]
+            for i, key in enumerate(keys):
+                cached = self._result_cache.get(key)
+                if cached is not None:
+                    results[i] = list(cached)
+            
+            pending = [i for i, result in enumerate(results) if result is None]
+            if pending:
+                found = db.similarity_search_batch(
+                    [queries[i] for i in pending], top_k, nprobe, ef_search, mode,
+                    embed=lambda texts: self._query_vectors(db, texts), sources=sources
+                )
+                for i, docs in zip(pending, found):
+                    self._result_cache.put(keys[i], docs)
+                    results[i] = list(docs)
+            
+            return results
+    
+    def _query_vectors(self, db, queries):
+        """
+        Return embeddings for the queries, computing only the uncached ones.
+        
+        Args:
+            db (VectorStore): Store whose embeddings model should be used
+            queries (list): Query strings
+            
+        Returns:
+            np.ndarray: float32 array of shape (len(queries), dim)
+        """
+        vectors = [self._vector_cache.get(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            embedded = db.embed_queries([queries[i] for i in missing])
+            
+            for i, vector in zip(missing, embedded):
+                self._vector_cache.put(queries[i], vector)
+                vectors[i] = vector
+        
+        return np.vstack(vectors)
+    
+    def cache_stats(self):
+        """
+        Return hit/miss statistics for the query caches.
+        
+        Returns:
+            dict: Stats for the query vector and result caches
+        """
+        return {
+            "index_version": self._version,
+            "query_vectors": self._vector_cache.stats(),
+            "results": self._result_cache.stats()
+        }
+
+class IndexWatcher(threading.Thread):
+    """Background thread that polls for new index versions and hot-swaps them."""
+    
+    def __init__(self, retriever, interval=INDEX_WATCH_INTERVAL):
+        super().__init__(name="faiss-index-watcher", daemon=True)
+        self.retriever = retriever
+        self.interval = interval
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        logger.info(f"Watching {self.retriever.index_root} for new index versions every {self.interval}s")
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.retriever.reload_if_changed()
+            except Exception as e:
+                logger.error(f"Error reloading FAISS index: {str(e)}")
+    
+    def stop(self):
+        """Ask the watcher to exit after its current poll."""
+        self._stop_event.set()
+
+# Shared retriever used by all requests in this process
+_retriever = Retriever()
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def get_retriever():
+    """Return the process-wide Retriever instance."""
+    return _retriever
+
+def invalidate_retriever():
+    """Force the shared retriever to reload the index on its next search."""
+    _retriever.invalidate()
+
+def get_cache_stats():
+    """Return hit/miss statistics for the shared retriever's query caches."""
+    return _retriever.cache_stats()
+
+def start_index_watcher(interval=INDEX_WATCH_INTERVAL):
+    """
+    Start the background index watcher for this process if not already running.
+    
+    Args:
+        interval (float): Seconds between checks for a new index version
+        
+    Returns:
+        IndexWatcher: The running watcher thread
+    """
+    global _watcher
+    
+    with _watcher_lock:
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = IndexWatcher(_retriever, interval)
+            _watcher.start()
+        return _watcher
+
+def get_relevant_documents(query, top_k=5, nprobe=None, ef_search=None, mode=None, sources=None):
     """
     Retrieve relevant documents based on the query.
     
     Args:
         query (str): The user's question or message
         top_k (int): Number of documents to retrieve
+        nprobe (int): Number of IVF lists to visit; higher is slower but more
+                      accurate. Defaults to FAISS_NPROBE.
+        ef_search (int): HNSW search beam width; higher is slower but more
+                         accurate. Defaults to FAISS_EF_SEARCH.
+        mode (str): "dense" for vector search only, or "hybrid" to fuse it
+                    with BM25 keyword search. Defaults to RETRIEVAL_MODE.
+        sources (list): Only search chunks from these source files, e.g.
+                        ["report.pdf"]. Defaults to searching everything.
         
     Returns:
         list: List of relevant document chunks
     """
     try:
-        # Load FAISS index
-        db = load_faiss_index()
-        
-        if db is None:
-            logger.warning("No FAISS index available. Returning empty results.")
-            return []
-        
-        # Query FAISS
-        docs = db.similarity_search(query, k=top_k)
+        # Query the resident FAISS index
+        docs = get_retriever().search(
+            query, top_k=top_k, nprobe=nprobe, ef_search=ef_search, mode=mode, sources=sources
+        )
         
         logger.info(f"Retrieved {len(docs)} documents for query: {query}")
         return docs
@@ -115,6 +1578,39 @@ def get_relevant_documents(query, top_k=5):
         logger.error(f"Error retrieving documents: {str(e)}")
         return []
 
+def get_relevant_documents_batch(queries, top_k=5, nprobe=None, ef_search=None, mode=None,
+                                 sources=None):
+    """
+    Retrieve relevant documents for several queries in one pass.
+    
+    Results match calling get_relevant_documents() for each query, but the
+    queries share one embedding forward pass and one FAISS search.
+    
+    Args:
+        queries (list): Questions or messages to search for
+        top_k (int): Number of documents to retrieve per query
+        nprobe (int): Number of IVF lists to visit. Defaults to FAISS_NPROBE.
+        ef_search (int): HNSW search beam width. Defaults to FAISS_EF_SEARCH.
+        mode (str): "dense" or "hybrid". Defaults to RETRIEVAL_MODE.
+        sources (list): Only search chunks from these source files
+        
+    Returns:
+        list: One list of relevant document chunks per query
+    """
+    queries = list(queries)
+    
+    try:
+        results = get_retriever().search_batch(
+            queries, top_k=top_k, nprobe=nprobe, ef_search=ef_search, mode=mode, sources=sources
+        )
+        
+        logger.info(f"Retrieved documents for {len(queries)} queries in one batch")
+        return results
+    
+    except Exception as e:
+        logger.error(f"Error retrieving documents for batch: {str(e)}")
+        return [[] for _ in queries]
+
 def add_documents_to_index(documents):
     """
     Add new documents to the existing FAISS index.
@@ -126,33 +1622,144 @@ def add_documents_to_index(documents):
         bool: True if successful, False otherwise
     """
     try:
-        # Load existing index
-        db = load_faiss_index()
+        with index_write_lock():
+            # Load a writable copy of the existing index
+            db = load_faiss_index(writable=True)
+            
+            # Create new index if one doesn't exist
+            if db is None:
+                logger.info("Creating new FAISS index")
+                _create_faiss_index(documents).close()
+                return True
+            
+            try:
+                # Add documents to index, skipping chunks that are already indexed
+                added = db.add_documents(documents)
+                
+                if not added:
+                    logger.info("No new documents to add; index is up to date")
+                    return True
+                
+                # Save updated index as a new version
+                save_index_version(db)
+                invalidate_retriever()
+            finally:
+                db.close()
         
-        # Create new index if one doesn't exist
-        if db is None:
-            logger.info("Creating new FAISS index")
-            create_faiss_index(documents)
-            return True
+        logger.info(f"Added {len(added)} new documents to FAISS index")
+        return True
+    
+    except Exception as e:
+        logger.error(f"Error adding documents to index: {str(e)}")
+        return False
+
+def remove_source(source):
+    """
+    Remove every chunk of one source document from the index.
+    
+    Args:
+        source (str): Source file name, as stored in chunk metadata
         
-        # Get embeddings
-        embeddings = get_embeddings()
+    Returns:
+        int: Number of chunks removed, or -1 on error
+    """
+    try:
+        with index_write_lock():
+            db = load_faiss_index(writable=True)
+            if db is None:
+                return 0
+            
+            try:
+                ids = db.docstore.ids_for_sources([source])
+                if len(ids) == 0:
+                    logger.warning(f"No chunks found for source '{source}'")
+                    return 0
+                
+                removed = db.remove_ids(ids)
+                
+                # Save updated index as a new version
+                save_index_version(db)
+                invalidate_retriever()
+            finally:
+                db.close()
         
-        # Add documents to index
-        db.add_documents(documents)
+        logger.info(f"Removed {removed} chunks of '{source}' from FAISS index")
+        return removed
+    
+    except Exception as e:
+        logger.error(f"Error removing source '{source}': {str(e)}")
+        return -1
+
+def replace_source(source, documents):
+    """
+    Replace every chunk of one source document with a new set of chunks.
+    
+    The old chunks are removed and the new ones embedded and added in a
+    single new index version, so readers never see the source missing.
+    
+    Args:
+        source (str): Source file name, as stored in chunk metadata
+        documents (list): New document chunks for the source
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    return update_sources({source: documents})
+
+def update_sources(documents_by_source, removed=()):
+    """
+    Replace the chunks of changed source documents and remove deleted ones.
+    
+    All changes are saved as a single new index version, so readers see
+    either the old or the new state of every source.
+    
+    Args:
+        documents_by_source (dict): Source file name -> new document chunks
+        removed (list): Source file names to remove from the index
         
-        # Save updated index
-        db.save_local(FAISS_INDEX_PATH)
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    removed = list(removed)
+    documents = [doc for docs in documents_by_source.values() for doc in docs]
+    
+    try:
+        with index_write_lock():
+            db = load_faiss_index(writable=True)
+            
+            # Nothing to replace; just build the index
+            if db is None:
+                if documents:
+                    _create_faiss_index(documents).close()
+                return True
+            
+            try:
+                ids = db.docstore.ids_for_sources(list(documents_by_source) + removed)
+                n_removed = db.remove_ids(ids)
+                added = db.add_documents(documents)
+                
+                if not n_removed and not added:
+                    logger.info("No changes to apply; index is up to date")
+                    return True
+                
+                # Save updated index as a new version
+                save_index_version(db)
+                invalidate_retriever()
+            finally:
+                db.close()
         
-        logger.info(f"Added {len(documents)} documents to FAISS index")
+        logger.info(
+            f"Updated {len(documents_by_source)} and removed {len(removed)} sources: "
+            f"removed {n_removed} chunks, added {len(added)}"
+        )
         return True
     
     except Exception as e:
-        logger.error(f"Error adding documents to index: {str(e)}")
+        logger.error(f"Error updating sources {sorted(documents_by_source) + removed}: {str(e)}")
         return False
 
-if __name__ == "__main__":
-    # This script will directly process PDFs and create/update the FAISS index when run
+def _build_command(args):
+    """Create or update the index from all processed documents."""
     from src.process_pdfs import load_processed_documents
     
     print("=== FAISS Vector Database Tool ===")
@@ -170,7 +1777,7 @@ if __name__ == "__main__":
         print("\n❌ No documents found to process!")
         print("Please add PDF files to the data/raw_files directory")
         print("and run process_pdfs.py first.")
-        sys.exit(1)
+        return 1
     
     # Add documents to index
     print(f"\nFound {len(documents)} document chunks. Creating/updating index...")
@@ -180,7 +1787,86 @@ if __name__ == "__main__":
         print(f"   - Index location: {FAISS_INDEX_PATH}")
         print(f"   - Document chunks: {len(documents)}")
         print("\nYou can now use the AI assistant to ask questions about your documents.")
-    else:
-        print("\n❌ Error creating/updating vector database.")
-        print("Please check the logs for more information.")
-        sys.exit(1)
+        return 0
+    
+    print("\n❌ Error creating/updating vector database.")
+    print("Please check the logs for more information.")
+    return 1
+
+def _remove_command(args):
+    """Remove one source document from the index, and its processed file."""
+    from src.process_pdfs import RAW_FILES_DIR, remove_processed_file
+    
+    removed = remove_source(args.source)
+    
+    if removed < 0:
+        print(f"\n❌ Error removing '{args.source}'. Please check the logs.")
+        return 1
+    
+    # Otherwise the next build would index the processed file again
+    processed_path = remove_processed_file(args.source)
+    
+    print(f"\n✅ Removed {removed} chunks of '{args.source}' from the index.")
+    if processed_path is not None:
+        print(f"   - Deleted processed file: {processed_path}")
+    
+    raw_path = RAW_FILES_DIR / args.source
+    if raw_path.exists():
+        print(f"\n⚠️  {raw_path} still exists and will be processed and indexed again by the next")
+        print("   integrate_pdfs.py, upload_pdf.py or watcher run. Delete it to keep it out of the index.")
+    return 0
+
+def _replace_command(args):
+    """Re-process one raw file and replace its chunks in the index."""
+    from src.process_pdfs import find_processed_file, load_processed_file, process_raw_file
+    
+    pdf_path = Path(args.pdf)
+    if not process_raw_file(pdf_path):
+        print(f"\n❌ Could not process {pdf_path}.")
+        return 1
+    
+    documents = load_processed_file(find_processed_file(pdf_path.name))
+    
+    if replace_source(pdf_path.name, documents):
+        print(f"\n✅ Replaced '{pdf_path.name}' with {len(documents)} chunks.")
+        return 0
+    
+    print(f"\n❌ Error replacing '{pdf_path.name}'. Please check the logs.")
+    return 1
+
+def _list_command(args):
+    """List indexed source documents."""
+    db = load_faiss_index()
+    if db is None:
+        print("No index found.")
+        return 1
+    
+    for source, count in db.docstore.list_sources():
+        print(f"{count:8d}  {source}")
+    return 0
+
+def main(argv=None):
+    """Command line entry point for managing the vector index."""
+    parser = argparse.ArgumentParser(description="Manage the FAISS vector index")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    subparsers.add_parser("build", help="Create/update the index from processed documents (default)")
+    
+    remove_parser = subparsers.add_parser("remove", help="Remove a source document from the index and delete its processed file")
+    remove_parser.add_argument("source", help="Source file name, e.g. report.pdf")
+    
+    replace_parser = subparsers.add_parser("replace", help="Re-process a document and replace its chunks")
+    replace_parser.add_argument("pdf", help="Path to the corrected PDF (or Word, CSV or text file)")
+    
+    subparsers.add_parser("list", help="List indexed source documents")
+    
+    args = parser.parse_args(argv)
+    commands = {
+        "remove": _remove_command,
+        "replace": _replace_command,
+        "list": _list_command,
+    }
+    return commands.get(args.command, _build_command)(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
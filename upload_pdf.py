@@ -2,8 +2,8 @@
 """
 PDF Upload Utility for Zetheta AI Assistant
 
-This script helps you upload PDF files to the data/raw_files directory
-and process them for use with the AI assistant.
+This script helps you upload PDF files (or Word, CSV and text files) to
+the data/raw_files directory and process them for use with the AI assistant.
 
 Usage:
     python upload_pdf.py [file1.pdf file2.pdf ...]
@@ -15,8 +15,8 @@ import shutil
 from pathlib import Path
 import logging
 
-from src.process_pdfs import process_all_pdfs
-from src.integrate_pdfs import integrate_documents
+from src.ingest_pipeline import ingest_raw_files
+from src.process_pdfs import is_supported_file
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -53,8 +53,8 @@ def copy_file(src_path, dest_dir):
         logger.error(f"Not a file: {src_path}")
         return None
     
-    if src_path.suffix.lower() != '.pdf':
-        logger.error(f"Not a PDF file: {src_path}")
+    if not is_supported_file(src_path):
+        logger.error(f"Not a supported file type (PDF, Word, CSV or text): {src_path}")
         return None
     
     dest_path = dest_dir / src_path.name
@@ -72,7 +72,7 @@ def main():
     # Check if files were specified
     if len(sys.argv) < 2:
         print(__doc__)
-        print("Error: No PDF files specified.")
+        print("Error: No files specified.")
         print("Example: python upload_pdf.py document1.pdf document2.pdf")
         return 1
     
@@ -87,24 +87,23 @@ def main():
     
     logger.info(f"Copied {success_count}/{len(sys.argv)-1} files to {RAW_FILES_DIR}")
     
-    # Process the PDFs
+    # Process and index the new or changed files in one streaming pass;
+    # unchanged files are skipped
     if success_count > 0:
-        logger.info("Processing PDF files...")
-        total, processed = process_all_pdfs()
-        logger.info(f"Processed {processed}/{total} PDF files")
+        logger.info("Processing files and integrating them with the vector database...")
+        try:
+            changes = ingest_raw_files()
+        except Exception as e:
+            logger.error(f"Failed to integrate documents into vector database: {str(e)}")
+            return 1
         
-        if processed > 0:
-            logger.info(f"PDF files processed and ready for use with the AI assistant")
+        if changes["processed"] or changes["removed"]:
+            logger.info(f"Files processed and ready for use with the AI assistant")
             logger.info(f"Processed data stored in {PROCESSED_FILES_DIR}")
-            
-            # Integrate with vector database
-            logger.info("Integrating documents with vector database...")
-            if integrate_documents():
-                logger.info("Successfully integrated documents into vector database")
-            else:
-                logger.error("Failed to integrate documents into vector database")
+        elif changes["failed"]:
+            logger.error("Failed to process any files")
         else:
-            logger.error("Failed to process any PDF files")
+            logger.info("All files are unchanged; the index is up to date")
     
     return 0
 